@@ -1,17 +1,68 @@
 from flask import Flask
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 
-# Create the Flask application instance
+# Create the Flask application instance. CLI-only commands (flask db,
+# generate-data, ...) are imported when first used (see app/startup.py).
+from app.startup import LazyAppGroup, LAZY_COMMANDS
 app = Flask(__name__)
+app.cli = LazyAppGroup(LAZY_COMMANDS, name=app.name)
 
 # Load the configuration from the Config class
 app.config.from_object(Config)
 
-# Initialize the database and migration engine
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Engine options for the configured DATABASE_PROFILE (pooling, SQLite pragmas)
+from app.engine import engine_options, init_engine
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+# Password checks run on a process pool with a bounded queue
+from app.passwords import password_hasher
+password_hasher.init_app(app)
+
+# Initialize the database. The routing session sends the reads of
+# @replica_reads views to the optional 'replica' bind. Flask-Migrate is set up
+# by the `flask db` commands.
+from app.replica import RoutingSession, init_replica
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+init_engine(app, db)
+init_replica(app, db)
+
+# Optional per-request query counting and slow-query logging
+from app.instrumentation import init_instrumentation
+init_instrumentation(app, db)
+
+# Background league recomputation
+from app.tasks import league_recomputer
+league_recomputer.init_app(app)
+
+# Server-side cache for rendered views and JSON payloads
+from app.cache import view_cache
+view_cache.init_app(app)
+
+# Per-request identity of the logged-in user (g.identity), cached briefly
+from app.identity import identity_cache
+identity_cache.init_app(app)
+
+# In-memory leaderboards (global, per league, per team)
+from app.leaderboard import leaderboards
+leaderboards.init_app(app)
+
+# In-process pub/sub for the managers' live event streams
+from app.events import event_broker
+event_broker.init_app(app)
 
 # Import routes and models at the bottom to avoid circular imports
-from app import routes, models
\ No newline at end of file
+from app import routes, models, scores, hierarchy
+
+
+def get_app():
+    """
+    Entry point for WSGI servers (run.py). This is not an app factory: there
+    is a single app, built when this package is imported since every module
+    registers on it. get_app() returns it, warmed up first when
+    STARTUP_PRELOAD is set.
+    """
+    if app.config['STARTUP_PRELOAD'] and 'startup_timings' not in app.extensions:
+        from app.startup import preload
+        app.extensions['startup_timings'] = preload(app, db)
+    return app
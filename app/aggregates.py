@@ -0,0 +1,113 @@
+from collections import defaultdict
+from sqlalchemy import select, func, literal
+from app import db
+from app.models import User, Goal, UserScore, OrgClosure, score_from_goals
+
+# Upper bound on the reporting chain length followed by the org-tree query.
+# Protects the recursive CTE against accidental manager_id cycles.
+MAX_ORG_DEPTH = 256
+
+
+def load_team_view(manager):
+    """
+    Loads every direct report of a manager together with their goals and
+    performance scores using a fixed number of queries (one for the reports,
+    one for all of their goals), regardless of the size of the team.
+
+    Returns (reports_data, chart_labels, chart_data) in the shape expected by
+    the dashboard template.
+    """
+    reports = manager.reports.all()
+
+    # Fetch the goals of the whole team in a single query, already sorted
+    # by status so each employee's list can be used as-is by the template.
+    goals_by_user = defaultdict(list)
+    if reports:
+        team_goals = (
+            Goal.query
+            .join(User, Goal.user_id == User.id)
+            .filter(User.manager_id == manager.id)
+            .order_by(Goal.user_id, Goal.status.asc())
+            .all()
+        )
+        for goal in team_goals:
+            goals_by_user[goal.user_id].append(goal)
+
+    reports_data = []
+    chart_labels = []
+    chart_data = []
+    for report in reports:
+        sorted_goals = goals_by_user.get(report.id, [])
+        report_score = score_from_goals(sorted_goals)
+
+        reports_data.append({
+            'employee': report,
+            'score': report_score,
+            'sorted_goals': sorted_goals
+        })
+        chart_labels.append(report.full_name)
+        chart_data.append(report_score)
+
+    return reports_data, chart_labels, chart_data
+
+
+def org_tree_cte(root_ids=None):
+    """
+    Recursive CTE of (ancestor_id, descendant_id, depth) pairs covering the
+    whole User.manager/reports hierarchy. With root_ids, only the subtrees
+    below those users are walked. Reads use the OrgClosure table instead;
+    this is what rebuilds it.
+    """
+    anchor = select(
+        User.manager_id.label('ancestor_id'),
+        User.id.label('descendant_id'),
+        literal(1).label('depth')
+    ).where(User.manager_id.isnot(None))
+    if root_ids is not None:
+        anchor = anchor.where(User.manager_id.in_(root_ids))
+
+    tree = anchor.cte('org_tree', recursive=True)
+    child = db.aliased(User)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, child.id, tree.c.depth + 1)
+        .join(child, child.manager_id == tree.c.descendant_id)
+        .where(tree.c.depth < MAX_ORG_DEPTH)
+    )
+    return tree
+
+
+def subtree_rollups(root_ids=None):
+    """
+    Weighted average progress of every subtree in the organization, computed
+    with one grouped query over the hierarchy closure (app/hierarchy.py) and
+    the cached per-user score totals.
+
+    Returns {user_id: {'avg_progress', 'headcount', 'total_weight'}} for every
+    user that has at least one report (directly or further down the chain).
+    The root's own goals are not part of its subtree, matching the team view.
+    """
+    query = (
+        select(
+            OrgClosure.ancestor_id,
+            func.count(OrgClosure.descendant_id),
+            func.coalesce(func.sum(UserScore.weighted_progress), 0.0),
+            func.coalesce(func.sum(UserScore.total_weight), 0)
+        )
+        .outerjoin(UserScore, UserScore.user_id == OrgClosure.descendant_id)
+        .where(OrgClosure.depth > 0)
+        .group_by(OrgClosure.ancestor_id)
+    )
+    if root_ids is not None:
+        root_ids = list(root_ids)
+        if not root_ids:
+            return {}
+        query = query.where(OrgClosure.ancestor_id.in_(root_ids))
+
+    rollups = {}
+    for ancestor_id, headcount, weighted, total_weight in db.session.execute(query):
+        rollups[ancestor_id] = {
+            'avg_progress': int(weighted / total_weight + 1e-9) if total_weight else 0,
+            'headcount': headcount,
+            'total_weight': total_weight
+        }
+    return rollups
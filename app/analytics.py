@@ -0,0 +1,286 @@
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import event, inspect, select, update, insert, delete, func, union_all
+from app import app, db
+from app.models import (User, Goal, ProgressUpdate, ProgressUpdateArchive, TeamScore, GoalDailyProgress,
+                        UserDailyProgress)
+
+# Progress analytics from precomputed daily buckets.
+#
+# GoalDailyProgress holds, per goal and UTC day, how many updates were
+# reported and the value/progress after the last one. UserDailyProgress holds
+# per user and day the update count and the change of their weighted
+# progress sum, i.e. the same quantity the score store accumulates, so a
+# team's score on any past day is its current TeamScore minus the deltas
+# recorded since.
+#
+# Both tables are filled incrementally: new ProgressUpdate rows from session
+# flushes (and the bulk endpoint) feed the counts, and every score delta
+# applied by app/scores.py feeds weighted_delta. `flask backfill-analytics`
+# rebuilds them from the existing audit trail (needs NumPy).
+
+# Window used for the velocity estimate in team_trend()
+VELOCITY_DAYS = 28
+
+
+def progress_percent(value, target_value):
+    """Progress (0-100) of a goal at `value`, like Goal.get_progress()."""
+    if target_value == 0:
+        return 100.0
+    return min(((value or 0) / target_value) * 100, 100.0)
+
+
+def _accumulate(connection, table, key, increments, values=None):
+    """Adds `increments` to one rollup row (and sets `values`), inserting it when missing."""
+    where = [table.c[column] == value for column, value in key.items()]
+    assignments = {column: table.c[column] + amount for column, amount in increments.items()}
+    assignments.update(values or {})
+    result = connection.execute(update(table).where(*where).values(assignments))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values({**key, **increments, **(values or {})}))
+
+
+def record_progress_updates(connection, updates):
+    """
+    Counts new progress updates into the daily rollups. `updates` is a list
+    of (goal_id, user_id, day, value, progress) in the order they happened.
+    """
+    goal_days = OrderedDict()
+    user_days = OrderedDict()
+    for goal_id, user_id, day, value, progress in updates:
+        count = goal_days.get((goal_id, day), (0,))[0]
+        goal_days[(goal_id, day)] = (count + 1, user_id, value, progress)
+        if user_id is not None:
+            user_days[(user_id, day)] = user_days.get((user_id, day), 0) + 1
+
+    goal_table = GoalDailyProgress.__table__
+    for (goal_id, day), (count, user_id, value, progress) in goal_days.items():
+        _accumulate(
+            connection, goal_table, {'goal_id': goal_id, 'day': day}, {'update_count': count},
+            {'user_id': user_id, 'closing_value': value, 'closing_progress': progress}
+        )
+    user_table = UserDailyProgress.__table__
+    for (user_id, day), count in user_days.items():
+        _accumulate(connection, user_table, {'user_id': user_id, 'day': day},
+                    {'update_count': count, 'weighted_delta': 0.0})
+
+
+def record_weighted_deltas(connection, user_deltas, day=None):
+    """Adds {user_id: [weighted, weight]} score deltas to today's user buckets."""
+    day = day or datetime.utcnow().date()
+    table = UserDailyProgress.__table__
+    for user_id, (weighted, _) in user_deltas.items():
+        if user_id is not None and weighted:
+            _accumulate(connection, table, {'user_id': user_id, 'day': day},
+                        {'update_count': 0, 'weighted_delta': weighted})
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_new_updates(session, flush_context):
+    new_updates = [obj for obj in session.new if isinstance(obj, ProgressUpdate)]
+    if not new_updates:
+        return
+
+    # Targets of goals already in the session (update_goal passes goal=...)
+    targets = {}
+    for obj in new_updates:
+        goal = inspect(obj).attrs.goal.loaded_value
+        if isinstance(goal, Goal):
+            targets[goal.id] = goal.target_value
+    missing = {obj.goal_id for obj in new_updates} - set(targets) - {None}
+    if missing:
+        targets.update(session.connection().execute(
+            select(Goal.id, Goal.target_value).where(Goal.id.in_(missing))
+        ).all())
+
+    updates = []
+    for obj in sorted(new_updates, key=lambda obj: obj.id):
+        if obj.goal_id not in targets:
+            continue
+        day = (obj.timestamp or datetime.utcnow()).date()
+        updates.append((obj.goal_id, obj.user_id, day, obj.update_value,
+                        progress_percent(obj.update_value, targets[obj.goal_id])))
+    if updates:
+        record_progress_updates(session.connection(), updates)
+
+
+# --- BACKFILL ---
+
+def _insert_chunked(connection, table, rows, chunk_size=10000):
+    for start in range(0, len(rows), chunk_size):
+        connection.execute(insert(table), rows[start:start + chunk_size])
+
+
+def backfill_daily_progress():
+    """
+    Rebuilds both rollup tables from the ProgressUpdate history with
+    vectorized NumPy grouping. Every goal is assumed to start at 0 progress.
+    Returns (goal day rows, user day rows).
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError('The analytics backfill needs NumPy: pip install numpy')
+
+    connection = db.session.connection()
+    connection.execute(delete(GoalDailyProgress))
+    connection.execute(delete(UserDailyProgress))
+
+    goals = connection.execute(select(Goal.id, Goal.target_value, Goal.weight)).all()
+    # Archived updates (app/archive.py) are part of the history too
+    history = union_all(*[
+        select(model.goal_id, model.user_id, model.update_value, model.timestamp, model.id)
+        .where(model.goal_id.isnot(None), model.timestamp.isnot(None))
+        for model in (ProgressUpdate, ProgressUpdateArchive)
+    ]).subquery()
+    rows = connection.execute(
+        select(history.c.goal_id, history.c.user_id, history.c.update_value, history.c.timestamp)
+        .order_by(history.c.goal_id, history.c.timestamp, history.c.id)
+    ).all()
+    if not rows or not goals:
+        db.session.commit()
+        return 0, 0
+
+    goal_ids, user_ids, values, timestamps = zip(*rows)
+    goal_ids = np.array(goal_ids, dtype=np.int64)
+    user_ids = np.array([-1 if user_id is None else user_id for user_id in user_ids], dtype=np.int64)
+    values = np.array(values, dtype=np.float64)
+    days = np.array(timestamps, dtype='datetime64[D]')
+
+    # Per-row target and weight, looked up by goal id; updates of deleted goals are dropped
+    size = max(max(goal.id for goal in goals), int(goal_ids.max())) + 1
+    targets = np.full(size, np.nan)
+    weights = np.zeros(size)
+    for goal_id, target_value, weight in goals:
+        targets[goal_id] = target_value
+        weights[goal_id] = weight or 0
+    known = ~np.isnan(targets[goal_ids])
+    goal_ids, user_ids, values, days = goal_ids[known], user_ids[known], values[known], days[known]
+    if not known.any():
+        db.session.commit()
+        return 0, 0
+    row_targets = targets[goal_ids]
+    row_weights = weights[goal_ids]
+
+    progress = np.full(len(values), 100.0)
+    nonzero = row_targets != 0
+    progress[nonzero] = np.minimum(values[nonzero] / row_targets[nonzero] * 100, 100.0)
+
+    # Progress before each update: the previous update of the same goal, or 0
+    first_of_goal = np.r_[True, goal_ids[1:] != goal_ids[:-1]]
+    previous = np.r_[0.0, progress[:-1]]
+    previous[first_of_goal] = 0.0
+    weighted_deltas = (progress - previous) * row_weights
+
+    # (goal, day) groups are contiguous because rows are sorted by goal and time
+    starts = np.flatnonzero(first_of_goal | np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(goal_ids)] - 1
+    goal_rows = [
+        {'goal_id': goal_id, 'day': day, 'user_id': None if user_id < 0 else user_id,
+         'update_count': count, 'closing_value': int(value), 'closing_progress': closing}
+        for goal_id, day, user_id, count, value, closing in zip(
+            goal_ids[starts].tolist(), days[starts].astype(object), user_ids[ends].tolist(),
+            (ends - starts + 1).tolist(), values[ends].tolist(), progress[ends].tolist()
+        )
+    ]
+
+    # (user, day) groups are not contiguous; group on a combined key instead
+    user_rows = []
+    owned = user_ids >= 0
+    if owned.any():
+        day_numbers = days[owned].astype(np.int64)
+        first_day = day_numbers.min()
+        span = int(day_numbers.max() - first_day) + 1
+        keys = user_ids[owned] * span + (day_numbers - first_day)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=weighted_deltas[owned])
+        user_rows = [
+            {'user_id': key // span,
+             'day': np.datetime64(int(first_day + key % span), 'D').astype(object),
+             'update_count': count, 'weighted_delta': weighted}
+            for key, count, weighted in zip(unique_keys.tolist(), counts.tolist(), sums.tolist())
+        ]
+
+    _insert_chunked(connection, GoalDailyProgress.__table__, goal_rows)
+    _insert_chunked(connection, UserDailyProgress.__table__, user_rows)
+    db.session.commit()
+    return len(goal_rows), len(user_rows)
+
+
+@app.cli.command('backfill-analytics')
+def backfill_analytics_command():
+    """Rebuild the daily progress rollups from the progress update history."""
+    try:
+        goal_days, user_days = backfill_daily_progress()
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    print(f"Backfilled {goal_days} goal-day and {user_days} user-day buckets.")
+
+
+# --- READ HELPERS ---
+
+def team_trend(manager_id, days=365, bucket='day'):
+    """
+    Daily (or weekly) team score, update counts and velocity for a manager's
+    direct reports over the last `days` days. Past scores are reconstructed
+    against the team's current total goal weight.
+    """
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(UserDailyProgress.day, func.sum(UserDailyProgress.update_count),
+               func.sum(UserDailyProgress.weighted_delta))
+        .join(User, User.id == UserDailyProgress.user_id)
+        .where(User.manager_id == manager_id, UserDailyProgress.day >= start)
+        .group_by(UserDailyProgress.day)
+    ).all()
+    by_day = {day: (count or 0, weighted or 0.0) for day, count, weighted in rows}
+
+    team = db.session.get(TeamScore, manager_id)
+    weighted = team.weighted_progress if team else 0.0
+    total_weight = team.total_weight if team else 0
+
+    # Walk back from today's totals, undoing each day's change
+    daily = []
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        count, delta = by_day.get(day, (0, 0.0))
+        score = max(weighted / total_weight, 0.0) if total_weight else 0.0
+        daily.append((day, count, score))
+        weighted -= delta
+    daily.reverse()
+
+    if bucket == 'week':
+        weeks = OrderedDict()
+        for day, count, score in daily:
+            week = day - timedelta(days=day.weekday())
+            previous = weeks.get(week, (0, score))
+            weeks[week] = (previous[0] + count, score)
+        series = [(week, count, score) for week, (count, score) in weeks.items()]
+    else:
+        series = daily
+
+    buckets = []
+    previous_score = None
+    for day, count, score in series:
+        buckets.append({
+            'date': day.isoformat(),
+            'updates': count,
+            'score': round(score, 2),
+            'change': round(score - previous_score, 2) if previous_score is not None else 0.0,
+        })
+        previous_score = score
+
+    current = daily[-1][2]
+    window = min(VELOCITY_DAYS, len(daily) - 1)
+    velocity = (current - daily[-1 - window][2]) / window if window else 0.0
+    days_to_target = math.ceil((100 - current) / velocity) if velocity > 0 and current < 100 else None
+    return {
+        'buckets': buckets,
+        'score': round(current, 2),
+        'velocity_per_day': round(velocity, 3),
+        'days_to_target': days_to_target,
+    }
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import select, insert, update, delete, func
+from app import app, db
+from app.models import ProgressUpdate, ProgressUpdateArchive, ProgressArchiveSummary
+
+# Archival of old progress updates.
+#
+# `flask archive-updates` moves updates older than ARCHIVE_AFTER_DAYS from
+# progress_update into progress_update_archive (tagged with their YYYY-MM
+# period) in batches of ARCHIVE_BATCH_SIZE, one short transaction each, and
+# keeps one ProgressArchiveSummary row per goal (count, time span, newest
+# archived update). Goal history reads the hot table first and only touches
+# the archive when a page reaches back past the goal's newest archived
+# update (see app/history.py); exports and the analytics backfill read both.
+#
+# Archived comments move from the hot full-text index to the archive one
+# (see app/search.py) along with their rows.
+# The newest update overall is never archived: SQLite hands out the highest
+# rowid again once it is deleted, which would collide with the archived id.
+
+ARCHIVE_COLUMNS = ('id', 'update_value', 'comment', 'proof_url', 'timestamp', 'user_id', 'goal_id')
+
+
+def _period(timestamp):
+    return timestamp.strftime('%Y-%m')
+
+
+def _update_summaries(connection, rows):
+    by_goal = {}
+    for row in rows:
+        if row.goal_id is None:
+            continue
+        count, first, last = by_goal.get(row.goal_id, (0, row, row))
+        if row.timestamp < first.timestamp:
+            first = row
+        if (row.timestamp, row.id) > (last.timestamp, last.id):
+            last = row
+        by_goal[row.goal_id] = (count + 1, first, last)
+    if not by_goal:
+        return
+
+    existing = {summary.goal_id: summary for summary in connection.execute(
+        select(ProgressArchiveSummary.__table__).where(ProgressArchiveSummary.goal_id.in_(by_goal))
+    )}
+    inserts = []
+    for goal_id, (count, first, last) in by_goal.items():
+        values = {
+            'archived_count': count, 'first_timestamp': first.timestamp, 'last_timestamp': last.timestamp,
+            'last_update_id': last.id, 'last_value': last.update_value,
+        }
+        summary = existing.get(goal_id)
+        if summary is None:
+            inserts.append({'goal_id': goal_id, **values})
+            continue
+        values['archived_count'] += summary.archived_count
+        values['first_timestamp'] = min(values['first_timestamp'], summary.first_timestamp)
+        if (summary.last_timestamp, summary.last_update_id) > (last.timestamp, last.id):
+            values.update(last_timestamp=summary.last_timestamp, last_update_id=summary.last_update_id,
+                          last_value=summary.last_value)
+        connection.execute(
+            update(ProgressArchiveSummary).where(ProgressArchiveSummary.goal_id == goal_id).values(values)
+        )
+    if inserts:
+        connection.execute(insert(ProgressArchiveSummary), inserts)
+
+
+def archive_progress_updates(older_than_days=None, batch_size=None):
+    """
+    Moves progress updates older than `older_than_days` into the archive.
+    Returns (updates moved, goals with archived updates after the run).
+    """
+    older_than_days = older_than_days or app.config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    horizon = datetime.utcnow() - timedelta(days=older_than_days)
+    newest_id = db.session.query(func.max(ProgressUpdate.id)).scalar()
+    db.session.commit()
+    if newest_id is None:
+        return 0, 0
+
+    columns = [ProgressUpdate.__table__.c[name] for name in ARCHIVE_COLUMNS]
+    moved = 0
+    last_id = 0
+    while True:
+        # Each batch is its own transaction, so writers are only held up briefly
+        eligible = (ProgressUpdate.timestamp < horizon, ProgressUpdate.id < newest_id)
+        rows = db.session.execute(
+            select(*columns).where(ProgressUpdate.id > last_id, *eligible)
+            .order_by(ProgressUpdate.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        first_id, last_id = rows[0].id, rows[-1].id
+
+        connection = db.session.connection()
+        connection.execute(insert(ProgressUpdateArchive), [
+            {**row._asdict(), 'period': _period(row.timestamp)} for row in rows
+        ])
+        # Same predicate over the batch's id range: exactly the rows just copied
+        connection.execute(delete(ProgressUpdate).where(ProgressUpdate.id.between(first_id, last_id), *eligible))
+        _update_summaries(connection, rows)
+        db.session.commit()
+        moved += len(rows)
+
+    goals = db.session.query(func.count(ProgressArchiveSummary.goal_id)).scalar()
+    return moved, goals
+
+
+@app.cli.command('archive-updates')
+@click.option('--older-than-days', type=int, help='Defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-size', type=int, help='Defaults to ARCHIVE_BATCH_SIZE.')
+def archive_updates_command(older_than_days, batch_size):
+    """Move old progress updates into the archive table."""
+    moved, goals = archive_progress_updates(older_than_days, batch_size)
+    print(f'Archived {moved} progress updates; {goals} goals now have archived history.')
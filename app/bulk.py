@@ -0,0 +1,106 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import insert, update
+from app import db
+from app.models import Goal, ProgressUpdate
+from app.scores import apply_score_deltas, goal_contribution
+from app.analytics import record_progress_updates, progress_percent
+
+# Bulk progress updates.
+#
+# A batch of {goal_id, progress, status, comment, proof_url} items is applied
+# in one transaction: ownership of every goal is checked with a single query,
+# the audit rows go in with one executemany INSERT and the goals with one
+# executemany UPDATE by primary key. Because the bulk statements bypass the
+# ORM flush, the score store deltas, goal revisions and daily analytics buckets
+# are applied here directly.
+
+
+def _item_error(index, goal_id, message):
+    return {'index': index, 'goal_id': goal_id, 'success': False, 'message': message}
+
+
+def _parse_item(item):
+    """Returns (goal_id, progress, status, comment, proof_url) or raises ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError('Each update must be an object.')
+    try:
+        goal_id = int(item.get('goal_id'))
+    except (TypeError, ValueError):
+        raise ValueError('A numeric goal_id is required.')
+    progress = item.get('progress')
+    if isinstance(progress, bool) or not isinstance(progress, (int, str)):
+        raise ValueError('A numeric progress value is required.')
+    try:
+        progress = int(progress)
+    except ValueError:
+        raise ValueError('A numeric progress value is required.')
+    comment = item.get('comment')
+    if not comment:
+        raise ValueError('An update comment is required.')
+    return goal_id, progress, item.get('status'), comment, item.get('proof_url')
+
+
+def apply_bulk_updates(user_id, items):
+    """
+    Applies a list of update items on behalf of `user_id` and returns a list of
+    per-item results (in input order). The caller commits.
+    """
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = _parse_item(item)
+        except ValueError as error:
+            goal_id = item.get('goal_id') if isinstance(item, dict) else None
+            results[index] = _item_error(index, goal_id, str(error))
+
+    goal_ids = {values[0] for values in parsed.values()}
+    goals = {}
+    if goal_ids:
+        rows = db.session.query(
+            Goal.id, Goal.user_id, Goal.current_value, Goal.target_value, Goal.weight, Goal.status
+        ).filter(Goal.id.in_(goal_ids))
+        goals = {row.id: row._asdict() for row in rows}
+
+    update_rows = []
+    rollup_rows = []
+    today = datetime.utcnow().date()
+    goal_state = {}
+    score_deltas = defaultdict(lambda: [0.0, 0])
+    for index, (goal_id, progress, status, comment, proof_url) in sorted(parsed.items()):
+        goal = goals.get(goal_id)
+        if goal is None:
+            results[index] = _item_error(index, goal_id, 'Goal not found')
+            continue
+        if goal['user_id'] != user_id:
+            results[index] = _item_error(index, goal_id, 'Permission denied')
+            continue
+
+        old_weighted, old_weight = goal_contribution(goal['current_value'], goal['target_value'], goal['weight'])
+        new_weighted, new_weight = goal_contribution(progress, goal['target_value'], goal['weight'])
+        score_deltas[user_id][0] += new_weighted - old_weighted
+        score_deltas[user_id][1] += new_weight - old_weight
+
+        # Later items for the same goal build on earlier ones in the batch
+        goal['current_value'] = progress
+        goal['status'] = status
+        goal_state[goal_id] = {'id': goal_id, 'current_value': progress, 'status': status}
+
+        update_rows.append({
+            'update_value': progress, 'comment': comment, 'proof_url': proof_url,
+            'user_id': user_id, 'goal_id': goal_id
+        })
+        rollup_rows.append((goal_id, user_id, today, progress, progress_percent(progress, goal['target_value'])))
+        results[index] = {'index': index, 'goal_id': goal_id, 'success': True}
+
+    if update_rows:
+        db.session.execute(insert(ProgressUpdate), update_rows)
+        db.session.execute(update(Goal), list(goal_state.values()))
+        db.session.execute(
+            update(Goal).where(Goal.id.in_(goal_state)).values(revision=Goal.revision + 1)
+        )
+        apply_score_deltas(db.session.connection(), score_deltas)
+        record_progress_updates(db.session.connection(), rollup_rows)
+
+    return results
@@ -0,0 +1,351 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from app import db
+from app.replica import served_from_replica
+from app.transactions import commit_handler, on_commit
+from app.models import User, Goal, ProgressUpdate
+
+# Server-side cache for rendered pages and JSON payloads.
+#
+# Entries are keyed by view and user and carry a set of dependency tags:
+# 'user:<id>' (that user's goals, score or profile changed), 'team:<id>'
+# (something changed for one of that manager's direct reports) and 'org'
+# (anything that affects the organizational view). Every tag has a generation
+# counter; an entry is only served while the generations it was stored with
+# are still current, so invalidating a tag is a single counter increment.
+# The memory backend keeps only the generations live entries depend on.
+#
+# Writes are detected from session flushes of Goal, User and ProgressUpdate,
+# and the tags are invalidated once the transaction commits. Code that
+# bypasses the ORM unit of work (bulk statements) calls invalidate_users().
+#
+# The memory backend only sees invalidations made by its own process. Other
+# workers keep serving the old entries until CACHE_DEFAULT_TTL runs out, so
+# it is for single-process servers; with several workers use 'sqlite'
+# (gunicorn.conf.py does).
+
+
+class MemoryBackend:
+    """In-process LRU with a TTL per entry and a bound on the entry count (single process only)."""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Generations are global here: every invalidation takes the next
+        # sequence number and stamps its tags with it. An entry is current
+        # while none of its tags was stamped after its snapshot, so stamps
+        # older than every live entry can be forgotten (see _prune)
+        self.sequence = 0
+        self.stamps = {}
+        self.pruned_through = 0
+        self.prune_at = 2 * max_entries
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def _is_current(self, entry, now):
+        expires, tags, sequence, _ = entry
+        return expires >= now and all(self.stamps.get(tag, 0) <= sequence for tag in tags)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if not self._is_current(entry, time.monotonic()):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[3]
+
+    def snapshot(self, tags):
+        with self.lock:
+            return frozenset(tags), self.sequence
+
+    def set(self, key, value, snapshot, ttl):
+        tags, sequence = snapshot
+        with self.lock:
+            if sequence < self.pruned_through:
+                # Built across a prune: invalidations it must see may be forgotten
+                return
+            self.entries[key] = (time.monotonic() + ttl, tags, sequence, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self.lock:
+            self.sequence += 1
+            for tag in tags:
+                self.stamps[tag] = self.sequence
+            if len(self.stamps) > self.prune_at:
+                self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self.entries.items() if not self._is_current(entry, now)]:
+            del self.entries[key]
+        oldest = min((entry[2] for entry in self.entries.values()), default=self.sequence)
+        self.stamps = {tag: stamp for tag, stamp in self.stamps.items() if stamp > oldest}
+        self.pruned_through = max(self.pruned_through, oldest)
+        # Long-lived entries can pin many stamps; back off so pruning stays amortized
+        self.prune_at = max(2 * self.max_entries, 2 * len(self.stamps))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.stamps.clear()
+            self.pruned_through = self.sequence
+            self.prune_at = 2 * self.max_entries
+
+    def size(self):
+        return len(self.entries)
+
+
+class SQLiteBackend:
+    """
+    Cache stored in a local SQLite file, shared by every worker process on
+    the host. Values are pickled; generations live in the same file.
+    """
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.evictions = 0
+        # A forked worker (gunicorn --preload) opens its own connections
+        os.register_at_fork(after_in_child=self._after_fork)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, expires REAL, tags BLOB, value BLOB)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_tag (tag TEXT PRIMARY KEY, generation INTEGER)'
+            )
+
+    def _after_fork(self):
+        self.local = threading.local()
+
+    def _connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self.local.connection = connection
+        return connection
+
+    def _generations(self, connection, tags):
+        if not tags:
+            return {}
+        placeholders = ','.join('?' * len(tags))
+        rows = connection.execute(
+            f'SELECT tag, generation FROM cache_tag WHERE tag IN ({placeholders})', list(tags)
+        ).fetchall()
+        generations = {tag: 0 for tag in tags}
+        generations.update(rows)
+        return generations
+
+    def get(self, key):
+        connection = self._connect()
+        row = connection.execute(
+            'SELECT expires, tags, value FROM cache_entry WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        expires, tags, value = row
+        tags = pickle.loads(tags)
+        if expires < time.time() or self._generations(connection, tags) != tags:
+            connection.execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+            return None
+        return pickle.loads(value)
+
+    def snapshot(self, tags):
+        return self._generations(self._connect(), tags)
+
+    def set(self, key, value, snapshot, ttl):
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, expires, tags, value) VALUES (?, ?, ?, ?)',
+            (key, time.time() + ttl, pickle.dumps(snapshot), pickle.dumps(value))
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count > self.max_entries:
+            # Drop the entries closest to expiry, plus a margin to avoid pruning on every set
+            excess = count - self.max_entries + self.max_entries // 10
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN '
+                '(SELECT key FROM cache_entry ORDER BY expires LIMIT ?)', (excess,)
+            )
+            self.evictions += excess
+
+    def invalidate(self, tags):
+        connection = self._connect()
+        connection.executemany(
+            'INSERT INTO cache_tag (tag, generation) VALUES (?, 1) '
+            'ON CONFLICT(tag) DO UPDATE SET generation = generation + 1',
+            [(tag,) for tag in tags]
+        )
+
+    def clear(self):
+        connection = self._connect()
+        connection.execute('DELETE FROM cache_entry')
+        connection.execute('DELETE FROM cache_tag')
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+
+class ViewCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl = 60
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['view_cache'] = self
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        max_entries = app.config.get('CACHE_MAX_ENTRIES', 5000)
+        if backend == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        elif backend == 'sqlite':
+            path = app.config.get('CACHE_SQLITE_PATH') or os.path.join(app.instance_path, 'view_cache.db')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(path, max_entries)
+        elif backend in (None, 'none'):
+            self.backend = None
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND: {backend!r}')
+
+    def cached(self, view, key, tags, build, ttl=None):
+        """
+        Returns the cached value for (view, key) or calls build() and stores
+        its result under the given dependency tags.
+        """
+        if self.backend is None:
+            return build()
+
+        cache_key = f'{view}:{key}'
+        value = self.backend.get(cache_key)
+        with self.lock:
+            self.stats[view]['hits' if value is not None else 'misses'] += 1
+        if value is not None:
+            return value
+
+        # Generations are read before building, so a write that lands while
+        # the value is being built leaves the stored entry already stale
+        snapshot = self.backend.snapshot(tags)
+        value = build()
+        ttl = ttl or self.default_ttl
+        if served_from_replica():
+            # The replica may not have the write that bumped the generations yet
+            ttl = min(ttl, current_app.config['REPLICA_MAX_LAG_SECONDS'])
+        self.backend.set(cache_key, value, snapshot, ttl)
+        return value
+
+    def invalidate(self, tags):
+        if self.backend is None or not tags:
+            return
+        self.backend.invalidate(tags)
+        with self.lock:
+            self.invalidations += len(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def metrics(self):
+        with self.lock:
+            views = {view: dict(counts) for view, counts in self.stats.items()}
+        hits = sum(counts['hits'] for counts in views.values())
+        misses = sum(counts['misses'] for counts in views.values())
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'entries': self.backend.size() if self.backend else 0,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+            'invalidations': self.invalidations,
+            'evictions': self.backend.evictions if self.backend else 0,
+            'views': views,
+        }
+
+
+view_cache = ViewCache()
+
+
+def user_tags(user_id, manager_id):
+    """Tags invalidated when something about this user changes."""
+    tags = {f'user:{user_id}', 'org'}
+    if manager_id is not None:
+        tags.add(f'team:{manager_id}')
+    return tags
+
+
+def invalidate_users(user_ids):
+    """Invalidates cached views depending on these users (for bulk writes)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    rows = db.session.execute(select(User.id, User.manager_id).where(User.id.in_(user_ids))).all()
+    tags = set()
+    for user_id, manager_id in rows:
+        tags |= user_tags(user_id, manager_id)
+    view_cache.invalidate(tags)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_cache_tags(session, flush_context):
+    if view_cache.backend is None:
+        return
+
+    user_ids = set()
+    extra_tags = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Goal):
+            history = inspect(obj).attrs.user_id.history
+            user_ids.update(history.added or history.unchanged or ())
+            user_ids.update(history.deleted or ())
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, ProgressUpdate):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, User):
+            user_ids.add(obj.id)
+            # The previous manager's team view changes too when a user moves
+            state = inspect(obj)
+            for manager_id in state.attrs.manager_id.history.deleted or ():
+                if manager_id is not None:
+                    extra_tags.add(f'team:{manager_id}')
+            for manager in state.attrs.manager.history.deleted or ():
+                if manager is not None and manager.id is not None:
+                    extra_tags.add(f'team:{manager.id}')
+    user_ids.discard(None)
+    if not user_ids:
+        return
+
+    rows = session.connection().execute(
+        select(User.id, User.manager_id).where(User.id.in_(user_ids))
+    ).all()
+    tags = set(extra_tags)
+    for user_id, manager_id in rows:
+        tags |= user_tags(user_id, manager_id)
+    # Deleted users no longer have a row to look up
+    for user_id in user_ids - {row[0] for row in rows}:
+        tags |= user_tags(user_id, None)
+    on_commit(session, 'cache_tags', tags)
+
+
+@commit_handler('cache_tags')
+def _invalidate_after_commit(tags):
+    view_cache.invalidate(tags)
@@ -0,0 +1,246 @@
+import random
+import time
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import func, update, bindparam, String
+from app import app, db
+from app.models import (User, Goal, ProgressUpdate, UserScore, TeamScore, GoalDailyProgress,
+                        UserDailyProgress, ProgressUpdateArchive, ProgressArchiveSummary, OrgClosure,
+                        league_for_score)
+from app.scores import rebuild_scores
+from app.analytics import backfill_daily_progress
+from app.hierarchy import rebuild_org_closure
+from app.identity import identity_cache
+from app.passwords import password_hasher
+from app.leaderboard import leaderboards
+from app.search import has_search_index, drop_search_triggers, create_search_triggers, rebuild_search_index
+
+# Synthetic data generator for benchmarks, capacity planning and tests.
+#
+# Builds an organization tree of `depth` levels where every manager has
+# `fanout` reports (plus one administrator), gives every non-admin user
+# `goals_per_user` goals and every goal `updates_per_goal` audit entries.
+# Rows are written with Core insert() executemany in chunks, and the password
+# hash is computed once and shared by every generated account.
+
+COMMENTS = [
+    'Completed the scheduled review.',
+    'Cleared pending files for the week.',
+    'Field visit done, report uploaded.',
+    'Data verified with the district office.',
+    'Follow-up meeting held with stakeholders.',
+]
+TARGETS = [10, 25, 50, 100]
+
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(table, rows, chunk_size):
+    for chunk in _chunks(rows, chunk_size):
+        db.session.execute(table.insert(), chunk)
+    return len(rows)
+
+
+def clear_data():
+    """
+    Deletes every user (and the reporting hierarchy), goal, audit entry (hot
+    and archived), cached score and analytics bucket.
+    """
+    for model in (GoalDailyProgress, UserDailyProgress, ProgressArchiveSummary, ProgressUpdateArchive,
+                  ProgressUpdate, TeamScore, UserScore, Goal, OrgClosure, User):
+        db.session.execute(model.__table__.delete())
+    db.session.commit()
+    # Ids are reused by the next load
+    identity_cache.clear()
+    leaderboards.reset()
+
+
+def generate(depth=3, fanout=5, goals_per_user=5, updates_per_goal=5,
+             password='password', seed=0, clear=True, days=365, chunk_size=10000):
+    """
+    Generates a synthetic organization and returns a summary dict with row
+    counts, the elapsed time and sample login emails for each role. All
+    generated accounts share `password`.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+
+    # Like the indexes below, the full-text index is filled in one pass at
+    # the end instead of by its triggers row by row
+    search_index = has_search_index(db.session.connection())
+    if search_index:
+        drop_search_triggers(db.session.connection())
+    deferred_indexes = []
+    try:
+        if clear:
+            clear_data()
+
+        # Building secondary indexes once after the load is much cheaper than
+        # maintaining them row by row, so they are dropped while the tables are empty.
+        if clear:
+            connection = db.session.connection()
+            for model in (Goal, ProgressUpdate):
+                for index in model.__table__.indexes:
+                    if not index.unique:
+                        index.drop(connection)
+                        deferred_indexes.append(index)
+
+        password_hash = password_hasher.hash(password)
+        next_user_id = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+        next_goal_id = (db.session.query(func.max(Goal.id)).scalar() or 0) + 1
+
+        # --- Users: one administrator, then the reporting tree level by level ---
+        admin_id = next_user_id
+        user_rows = [{
+            'id': admin_id, 'full_name': f'Admin {admin_id}', 'email': f'admin{admin_id}@gov.in',
+            'password_hash': password_hash, 'role': 'Administrator', 'league': 'Bronze',
+            'manager_id': None
+        }]
+        next_user_id += 1
+
+        goal_owners = []
+        parents = [None]  # top-level managers report to nobody, like the sample data
+        for level in range(1, depth + 1):
+            role = 'Manager' if level < depth else 'Employee'
+            level_ids = []
+            for parent_id in parents:
+                for _ in range(fanout):
+                    user_id = next_user_id
+                    next_user_id += 1
+                    user_rows.append({
+                        'id': user_id, 'full_name': f'{role} {user_id}',
+                        'email': f'{role.lower()}{user_id}@gov.in',
+                        'password_hash': password_hash, 'role': role, 'league': 'Bronze',
+                        'manager_id': parent_id
+                    })
+                    level_ids.append(user_id)
+            goal_owners.extend(level_ids)
+            parents = level_ids
+
+        users = _insert(User.__table__, user_rows, chunk_size)
+        # Core inserts skip the session hooks that maintain the closure
+        rebuild_org_closure()
+
+        # --- Goals and their audit trail ---
+        # Buffered per chunk; goals are always written before the updates that
+        # reference them.
+        now = datetime.utcnow()
+        goal_rows = []
+        update_rows = []
+        goals = 0
+        updates = 0
+        goal_id = next_goal_id
+
+        # Timestamps are bound as ISO strings (the layout SQLAlchemy uses for
+        # SQLite, which other backends also parse) to skip per-row type processing.
+        insert_updates = ProgressUpdate.__table__.insert().values(
+            timestamp=bindparam('timestamp', type_=String)
+        )
+
+        def flush():
+            if goal_rows:
+                db.session.execute(Goal.__table__.insert(), goal_rows)
+            if update_rows:
+                db.session.execute(insert_updates, update_rows)
+            goal_rows.clear()
+            update_rows.clear()
+
+        for user_id in goal_owners:
+            for _ in range(goals_per_user):
+                target_value = rng.choice(TARGETS)
+                current_value = rng.randint(0, target_value)
+                goal_rows.append({
+                    'id': goal_id, 'title': f'Goal {goal_id}',
+                    'description': None, 'kpi_name': 'Units',
+                    'current_value': current_value, 'target_value': target_value,
+                    'weight': rng.randint(1, 10),
+                    'status': 'Completed' if current_value >= target_value else 'In Progress',
+                    'user_id': user_id
+                })
+                start = now - timedelta(days=rng.randint(1, max(days, 1)))
+                step = (now - start) / (updates_per_goal + 1)
+                for n in range(updates_per_goal):
+                    update_rows.append({
+                        'goal_id': goal_id, 'user_id': user_id,
+                        'update_value': current_value * (n + 1) // updates_per_goal,
+                        'comment': COMMENTS[(goal_id + n) % len(COMMENTS)],
+                        'proof_url': None if n % 3 else f'EOFF/{goal_id}/{n}',
+                        'timestamp': (start + step * (n + 1)).isoformat(' ', 'microseconds')
+                    })
+                goals += 1
+                updates += updates_per_goal
+                goal_id += 1
+            if len(goal_rows) + len(update_rows) >= chunk_size:
+                flush()
+        flush()
+    except BaseException:
+        db.session.rollback()
+        raise
+    finally:
+        # Indexes and search triggers come back even if the load failed
+        connection = db.session.connection()
+        for index in deferred_indexes:
+            index.create(connection, checkfirst=True)
+        if search_index:
+            create_search_triggers(connection)
+            rebuild_search_index(connection)
+        db.session.commit()
+
+    # --- Derived data: cached scores, daily rollups and leagues ---
+    rebuild_scores()
+    # Core inserts skip the session hooks that fill the rollups as well
+    backfill_daily_progress()
+    # Only the generated users (all Bronze so far); leagues of existing users
+    # are sticky and stay as they are when appending
+    by_league = {}
+    generated = db.session.query(UserScore.user_id, UserScore.performance_score) \
+        .filter(UserScore.user_id.between(admin_id, next_user_id - 1))
+    for user_id, score in generated:
+        by_league.setdefault(league_for_score(score, 'Bronze'), []).append(user_id)
+    for league, user_ids in by_league.items():
+        for chunk in _chunks(user_ids, 500):
+            db.session.execute(update(User.__table__).where(User.id.in_(chunk)).values(league=league))
+    db.session.commit()
+    identity_cache.invalidate(user_id for user_ids in by_league.values() for user_id in user_ids)
+    leaderboards.reset()
+
+    manager_id = next((row['id'] for row in user_rows if row['role'] == 'Manager'), None)
+    employee_id = next((row['id'] for row in user_rows if row['role'] == 'Employee'), None)
+    return {
+        'users': users,
+        'goals': goals,
+        'updates': updates,
+        'seconds': round(time.perf_counter() - started, 2),
+        'password': password,
+        'admin_email': f'admin{admin_id}@gov.in',
+        'manager_email': f'manager{manager_id}@gov.in' if manager_id else None,
+        'employee_email': f'employee{employee_id}@gov.in' if employee_id else None,
+    }
+
+
+@app.cli.command('generate-data')
+@click.option('--depth', default=3, show_default=True, help='Levels in the reporting tree.')
+@click.option('--fanout', default=5, show_default=True, help='Reports per manager.')
+@click.option('--goals-per-user', default=5, show_default=True)
+@click.option('--updates-per-goal', default=5, show_default=True)
+@click.option('--password', default='password', show_default=True, help='Password for every account.')
+@click.option('--seed', default=0, show_default=True, help='Random seed.')
+@click.option('--append', is_flag=True, help='Keep existing data instead of clearing it.')
+def generate_data_command(depth, fanout, goals_per_user, updates_per_goal, password, seed, append):
+    """Fill the database with a synthetic organization."""
+    summary = generate(depth, fanout, goals_per_user, updates_per_goal,
+                       password=password, seed=seed, clear=not append)
+    print(f"Generated {summary['users']} users, {summary['goals']} goals and "
+          f"{summary['updates']} updates in {summary['seconds']}s.")
+    print(f"Sample logins (password '{password}'): {summary['admin_email']}, "
+          f"{summary['manager_email']}, {summary['employee_email']}")
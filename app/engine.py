@@ -0,0 +1,86 @@
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Database engine profiles.
+#
+# DATABASE_PROFILE = 'default' leaves SQLAlchemy's defaults alone (what the
+# sample setup and tests use). 'production' tunes the engine for several
+# gunicorn workers sharing one database:
+#
+# - SQLite: WAL journal mode so readers never block the writer (and vice
+#   versa), synchronous=NORMAL (durable at checkpoints instead of every
+#   commit, safe in WAL mode), a busy timeout so concurrent writers queue up
+#   instead of failing with "database is locked", and a memory-mapped read
+#   path. With SQLITE_BEGIN_IMMEDIATE, transactions outside GET/HEAD/OPTIONS
+#   requests (form posts, background jobs, CLI commands) take the write lock
+#   up front with BEGIN IMMEDIATE. Otherwise a transaction that reads first
+#   fails at its first write if another worker committed in between, which
+#   busy_timeout can't retry. Reads keep plain BEGIN so they still run
+#   concurrently.
+# - Server databases: pool size, overflow, recycle and pre-ping settings.
+
+
+_READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _is_sqlite(config):
+    return make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured DATABASE_PROFILE."""
+    if config.get('DATABASE_PROFILE', 'default') != 'production':
+        return {}
+    if _is_sqlite(config):
+        # SQLite's own busy handler is set by PRAGMA busy_timeout below; the
+        # driver-level timeout is kept in line with it
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def sqlite_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+
+def _configure_sqlite(engine, pragmas, begin_immediate):
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        if begin_immediate:
+            # Let SQLAlchemy emit BEGIN itself (see _begin below)
+            dbapi_connection.isolation_level = None
+
+    if begin_immediate:
+        @event.listens_for(engine, 'begin')
+        def _begin(connection):
+            if has_request_context() and request.method in _READ_ONLY_METHODS:
+                connection.exec_driver_sql('BEGIN')
+            else:
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def init_engine(app, db):
+    """Applies the profile's per-connection settings to every engine."""
+    if app.config.get('DATABASE_PROFILE', 'default') != 'production':
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    pragmas = sqlite_pragmas(app.config)
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            _configure_sqlite(engine, pragmas, app.config['SQLITE_BEGIN_IMMEDIATE'])
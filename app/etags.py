@@ -0,0 +1,67 @@
+import zlib
+from flask import request, make_response
+from sqlalchemy import event, func
+from app import db
+from app.models import Goal, ProgressUpdate, ProgressArchiveSummary
+
+# Versioned ETags for the JSON endpoints polled by the dashboard modals.
+#
+# Every Goal row carries a revision counter that is bumped in SQL whenever
+# the row changes. A goal's history is versioned by (goal revision, newest
+# ProgressUpdate id, hot or archived) and an employee's goal list by (goal count, sum of
+# revisions, highest goal id), both read with a single indexed aggregate.
+# When the client's If-None-Match still matches, a 304 is returned before the
+# full query and serialization run.
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_goal_revisions(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, Goal) and session.is_modified(obj, include_collections=False):
+            # Incremented in the UPDATE itself, so concurrent writers can't lose a bump
+            obj.revision = Goal.revision + 1
+
+
+def _etag(*parts):
+    return '-'.join(str(part) for part in parts)
+
+
+def _query_fingerprint():
+    # Different pages/formats of the same resource need different tags
+    return zlib.crc32(request.query_string)
+
+
+def goal_history_etag(goal):
+    # Newest update of the goal, falling back to the newest archived one
+    # (app/archive.py) once all of its updates have been moved there
+    hot = db.session.query(func.max(ProgressUpdate.id)) \
+        .filter(ProgressUpdate.goal_id == goal.id).scalar_subquery()
+    archived = db.session.query(ProgressArchiveSummary.last_update_id) \
+        .filter(ProgressArchiveSummary.goal_id == goal.id).scalar_subquery()
+    latest_update_id = db.session.query(func.coalesce(hot, archived)).scalar()
+    return _etag('h', goal.id, goal.revision, latest_update_id or 0, _query_fingerprint())
+
+
+def employee_goals_etag(employee):
+    count, revisions, latest_goal_id = db.session.query(
+        func.count(Goal.id), func.sum(Goal.revision), func.max(Goal.id)
+    ).filter(Goal.user_id == employee.id).one()
+    return _etag(
+        'g', employee.id, count, revisions or 0, latest_goal_id or 0,
+        zlib.crc32(employee.full_name.encode()), _query_fingerprint()
+    )
+
+
+def conditional_response(etag, build_response):
+    """
+    Returns 304 when the request's If-None-Match matches `etag`, otherwise
+    the response from build_response() tagged with it. Clients must
+    revalidate every time, so the data is never served stale.
+    """
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(build_response())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
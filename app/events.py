@@ -0,0 +1,200 @@
+import itertools
+import json
+import threading
+from collections import deque, defaultdict
+
+# Live change events for managers' dashboards (server-sent events).
+#
+# Write routes publish small events once their transaction has committed:
+# 'progress' (goal_id, current_value, status and a summary of the new
+# ProgressUpdate) and 'feedback' (goal_id, manager_feedback). Each goes to
+# the channel of every manager above the goal owner, so skip-level managers
+# see their whole org. GET /events streams a manager's channel as
+# text/event-stream.
+#
+# Streams are off unless EVENTS_ENABLED is set, because an open stream holds
+# its worker. Serve them from an async worker (gunicorn -k gevent). That also
+# makes the waits below cooperative, so an idle stream costs a greenlet
+# instead of a thread. The broker is in-process: subscribers only see events
+# published by the same worker, so run one such worker per host or treat the
+# stream as a hint next to the usual page refreshes.
+#
+# Every subscriber has a bounded buffer. A consumer that falls more than
+# EVENTS_QUEUE_SIZE events behind has its buffer dropped and gets a single
+# 'resync' event, telling the client to reload instead of replaying history.
+
+RESYNC = 'resync'
+
+
+class BrokerFull(Exception):
+    """The broker already has EVENTS_MAX_SUBSCRIBERS subscribers."""
+
+
+class Subscription:
+    def __init__(self, broker, channel, max_events):
+        self.broker = broker
+        self.channel = channel
+        self.max_events = max_events
+        self.events = deque()
+        self.overflowed = False
+        self.condition = threading.Condition()
+
+    def put(self, event):
+        with self.condition:
+            if self.overflowed:
+                return
+            if len(self.events) >= self.max_events:
+                self.events.clear()
+                self.overflowed = True
+            else:
+                self.events.append(event)
+            self.condition.notify()
+
+    def get(self, timeout):
+        """Waits up to `timeout` seconds; returns the buffered events (possibly none)."""
+        with self.condition:
+            if not self.events and not self.overflowed:
+                self.condition.wait(timeout)
+            if self.overflowed:
+                self.overflowed = False
+                return [(None, RESYNC, {})]
+            events = list(self.events)
+            self.events.clear()
+            return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EventBroker:
+    def __init__(self, app=None):
+        self.queue_size = 100
+        self.keepalive = 15
+        self.max_subscribers = 5000
+        self.channels = defaultdict(set)
+        self.subscribers = 0
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.published = 0
+        self.overflows = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['event_broker'] = self
+        self.queue_size = app.config.get('EVENTS_QUEUE_SIZE', 100)
+        self.keepalive = app.config.get('EVENTS_KEEPALIVE_SECONDS', 15)
+        self.max_subscribers = app.config.get('EVENTS_MAX_SUBSCRIBERS', 5000)
+
+    def subscribe(self, channel):
+        with self.lock:
+            if self.subscribers >= self.max_subscribers:
+                raise BrokerFull()
+            subscription = Subscription(self, channel, self.queue_size)
+            self.channels[channel].add(subscription)
+            self.subscribers += 1
+        return subscription
+
+    def is_full(self):
+        with self.lock:
+            return self.subscribers >= self.max_subscribers
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.channels.get(subscription.channel)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.channels[subscription.channel]
+            self.subscribers -= 1
+
+    def publish(self, channel, kind, data):
+        """Delivers an event to every current subscriber of `channel`."""
+        with self.lock:
+            subscribers = list(self.channels.get(channel, ()))
+            event = (next(self.ids), kind, data)
+            self.published += 1
+        for subscription in subscribers:
+            if subscription.overflowed:
+                continue
+            subscription.put(event)
+            if subscription.overflowed:
+                with self.lock:
+                    self.overflows += 1
+
+    def stream(self, channel, resume=False):
+        """
+        Yields `channel` as text/event-stream chunks until the client goes
+        away. The subscription is only made once the response starts, so a
+        client that disconnects before that leaves nothing behind.
+        """
+        subscription = None
+        try:
+            subscription = self.subscribe(channel)
+            yield f'retry: {self.keepalive * 1000}\n\n'
+            if resume:
+                # Reconnected: events published while away are gone
+                yield format_event(None, RESYNC, {})
+            while True:
+                events = subscription.get(self.keepalive)
+                if not events:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield ''.join(format_event(*event) for event in events)
+        except BrokerFull:
+            # Filled up after the route checked; the client retries later
+            yield f'retry: {self.keepalive * 1000}\n\n'
+        finally:
+            if subscription is not None:
+                subscription.close()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'subscribers': self.subscribers,
+                'channels': len(self.channels),
+                'published': self.published,
+                'overflows': self.overflows,
+            }
+
+
+event_broker = EventBroker()
+
+
+def format_event(event_id, kind, data):
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'event: {kind}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def team_channel(manager_id):
+    return f'team:{manager_id}'
+
+
+def publish_progress(manager_ids, goal_id, user_id, current_value, status, update):
+    """
+    Announces a committed progress update to the managers above the owner
+    (hierarchy.ancestor_ids()). `update` summarizes the new ProgressUpdate
+    (id, comment, proof_url, timestamp).
+    """
+    data = {
+        'goal_id': goal_id, 'user_id': user_id, 'current_value': current_value,
+        'status': status, 'update': update,
+    }
+    for manager_id in manager_ids:
+        event_broker.publish(team_channel(manager_id), 'progress', data)
+
+
+def publish_feedback(manager_ids, goal_id, feedback):
+    """Announces new feedback on a goal to the managers above its owner."""
+    data = {'goal_id': goal_id, 'manager_feedback': feedback}
+    for manager_id in manager_ids:
+        event_broker.publish(team_channel(manager_id), 'feedback', data)
@@ -0,0 +1,201 @@
+import csv
+import io
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import select
+from app import app, db
+from app.models import User, Goal, ProgressUpdate, ProgressUpdateArchive
+from app.hierarchy import org_member_ids
+
+# Audit exports of goals and progress updates.
+#
+# Rows are read with yield_per (a server-side cursor where the driver has
+# one) and written out batch by batch, so memory stays bounded by the batch
+# size however many rows match. Update exports include archived updates
+# (app/archive.py). CSV is streamed by the /export route and the `flask
+# export` command; the command can also write a Parquet file in row groups
+# (needs pyarrow).
+#
+# Filters: manager_id limits the export to that manager and everyone below
+# them in the reporting tree; start/end (dates, end inclusive) limit progress
+# updates by timestamp. Goals have no date of their own and are only
+# filtered by subtree.
+
+EXPORT_BATCH_SIZE = 2000
+
+COLUMNS = {
+    'goals': [
+        ('goal_id', Goal.id),
+        ('title', Goal.title),
+        ('kpi_name', Goal.kpi_name),
+        ('current_value', Goal.current_value),
+        ('target_value', Goal.target_value),
+        ('weight', Goal.weight),
+        ('status', Goal.status),
+        ('due_date', Goal.due_date),
+        ('owner_id', Goal.user_id),
+        ('owner_name', User.full_name),
+        ('owner_email', User.email),
+        ('manager_id', User.manager_id),
+        ('manager_feedback', Goal.manager_feedback),
+    ],
+    'updates': [
+        ('update_id', ProgressUpdate.id),
+        ('goal_id', ProgressUpdate.goal_id),
+        ('goal_title', Goal.title),
+        ('author_id', ProgressUpdate.user_id),
+        ('author_name', User.full_name),
+        ('update_value', ProgressUpdate.update_value),
+        ('comment', ProgressUpdate.comment),
+        ('proof_url', ProgressUpdate.proof_url),
+        ('timestamp', ProgressUpdate.timestamp),
+    ],
+}
+
+
+def _in_subtree(user_id_column, manager_id):
+    return user_id_column.in_(org_member_ids(manager_id, include_self=True))
+
+
+def _columns(kind, model):
+    # Update columns are read from the hot or the archive table alike
+    return [
+        (getattr(model, column.key) if column.class_ is ProgressUpdate else column).label(name)
+        for name, column in COLUMNS[kind]
+    ]
+
+
+def export_statement(kind, manager_id=None, start=None, end=None, model=ProgressUpdate):
+    """
+    SELECT for an export; `kind` is 'goals' or 'updates'. Updates are read
+    from `model`, ProgressUpdate or ProgressUpdateArchive.
+    """
+    if kind not in COLUMNS:
+        raise ValueError(f'Unknown export: {kind!r}')
+    columns = _columns(kind, model)
+
+    if kind == 'goals':
+        statement = select(*columns).outerjoin(User, User.id == Goal.user_id).order_by(Goal.id)
+        if manager_id is not None:
+            statement = statement.where(_in_subtree(Goal.user_id, manager_id))
+        return statement
+
+    statement = (
+        select(*columns)
+        .outerjoin(Goal, Goal.id == model.goal_id)
+        .outerjoin(User, User.id == model.user_id)
+        .order_by(model.id)
+    )
+    if manager_id is not None:
+        statement = statement.where(_in_subtree(Goal.user_id, manager_id))
+    if start is not None:
+        statement = statement.where(model.timestamp >= start)
+    if end is not None:
+        statement = statement.where(model.timestamp < end + timedelta(days=1))
+    return statement
+
+
+def iter_batches(kind, manager_id=None, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yields lists of at most batch_size rows (archived updates before the hot ones)."""
+    models = [ProgressUpdateArchive, ProgressUpdate] if kind == 'updates' else [ProgressUpdate]
+    for model in models:
+        result = db.session.execute(
+            export_statement(kind, manager_id, start, end, model),
+            execution_options={'yield_per': batch_size}
+        )
+        for partition in result.partitions():
+            yield partition
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(' ', 'seconds')
+    return value
+
+
+def iter_csv(kind, manager_id=None, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yields the export as CSV text, one chunk per batch (header first)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in COLUMNS[kind]])
+    yield buffer.getvalue()
+    for batch in iter_batches(kind, manager_id, start, end, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+
+
+def write_csv(kind, path, manager_id=None, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """Writes the export to a CSV file. Returns the row count."""
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in COLUMNS[kind]])
+        for batch in iter_batches(kind, manager_id, start, end, batch_size):
+            writer.writerows([_csv_value(value) for value in row] for row in batch)
+            rows += len(batch)
+    return rows
+
+
+def write_parquet(kind, path, manager_id=None, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """Writes the export to a Parquet file, one row group per batch. Returns the row count."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export needs pyarrow: pip install pyarrow')
+
+    types = {
+        'due_date': pa.timestamp('us'),
+        'timestamp': pa.timestamp('us'),
+    }
+    integer_columns = {'goal_id', 'update_id', 'current_value', 'target_value', 'weight',
+                       'owner_id', 'manager_id', 'author_id', 'update_value'}
+    schema = pa.schema([
+        (name, types.get(name, pa.int64() if name in integer_columns else pa.string()))
+        for name, _ in COLUMNS[kind]
+    ])
+
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in iter_batches(kind, manager_id, start, end, batch_size):
+            columns = list(zip(*batch))
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows += len(batch)
+    return rows
+
+
+def parse_date(value):
+    """YYYY-MM-DD -> datetime (None passes through); raises ValueError."""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(COLUMNS)))
+@click.option('--output', '-o', required=True, help='File to write.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'parquet']), default='csv', show_default=True)
+@click.option('--manager-id', type=int, help="Only this manager's reporting subtree.")
+@click.option('--start', help='First day of updates to include (YYYY-MM-DD).')
+@click.option('--end', help='Last day of updates to include (YYYY-MM-DD).')
+@click.option('--batch-size', default=EXPORT_BATCH_SIZE, show_default=True)
+def export_command(kind, output, file_format, manager_id, start, end, batch_size):
+    """Export goals or progress updates to CSV or Parquet."""
+    try:
+        start, end = parse_date(start), parse_date(end)
+    except ValueError:
+        raise click.BadParameter('dates must be YYYY-MM-DD')
+
+    if file_format == 'parquet':
+        try:
+            rows = write_parquet(kind, output, manager_id, start, end, batch_size)
+        except RuntimeError as error:
+            raise click.ClickException(str(error))
+    else:
+        rows = write_csv(kind, output, manager_id, start, end, batch_size)
+    print(f'Exported {rows} {kind} rows to {output}.')
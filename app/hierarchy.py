@@ -0,0 +1,178 @@
+from sqlalchemy import event, inspect, select, insert, delete, literal
+from app import app, db
+from app.models import User, Goal, OrgClosure
+from app.aggregates import org_tree_cte
+
+# Reporting hierarchy as a closure table.
+#
+# OrgClosure holds one (ancestor_id, descendant_id, depth) row for every pair
+# of users where the ancestor is somewhere above the descendant in the
+# User.manager_id tree, plus a depth-0 row pairing each user with themselves.
+# Whether a manager is above a user (directly or skip-level) is then one
+# primary-key lookup, and everyone below a manager is one index range.
+#
+# Flushes keep the table current: new users get their manager's ancestor rows
+# one level deeper, and a user who moves to another manager takes their
+# whole subtree along (the rows linking the subtree to the old ancestors are
+# deleted, rows to the new ones inserted). Bulk loads that bypass the session
+# call rebuild_org_closure(); `flask rebuild-org-closure` repairs drift.
+
+
+class ReportingCycle(ValueError):
+    """A user would end up reporting to themselves or someone below them."""
+
+
+def _insert_user(connection, user_id, manager_id):
+    connection.execute(insert(OrgClosure).values(ancestor_id=user_id, descendant_id=user_id, depth=0))
+    if manager_id is not None:
+        connection.execute(insert(OrgClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(OrgClosure.ancestor_id, literal(user_id), OrgClosure.depth + 1)
+            .where(OrgClosure.descendant_id == manager_id)
+        ))
+
+
+def _move_user(connection, user_id, manager_id):
+    subtree = select(OrgClosure.descendant_id).where(OrgClosure.ancestor_id == user_id)
+    if manager_id is not None and connection.execute(
+        select(OrgClosure.depth).where(OrgClosure.ancestor_id == user_id, OrgClosure.descendant_id == manager_id)
+    ).first() is not None:
+        raise ReportingCycle(f'User {manager_id} is below user {user_id} and cannot become their manager')
+
+    old_ancestors = [ancestor_id for ancestor_id, in connection.execute(
+        select(OrgClosure.ancestor_id).where(OrgClosure.descendant_id == user_id, OrgClosure.depth > 0)
+    )]
+    if old_ancestors:
+        connection.execute(delete(OrgClosure).where(
+            OrgClosure.ancestor_id.in_(old_ancestors), OrgClosure.descendant_id.in_(subtree)
+        ))
+    if manager_id is not None:
+        above = db.aliased(OrgClosure)
+        below = db.aliased(OrgClosure)
+        connection.execute(insert(OrgClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+            .select_from(above).join(below, below.ancestor_id == user_id)
+            .where(above.descendant_id == manager_id)
+        ))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_reporting_changes(session, flush_context, instances):
+    moved = session.info.setdefault('org_moved', set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and obj.id is not None and (
+            inspect(obj).attrs.manager_id.history.has_changes()
+            or inspect(obj).attrs.manager.history.has_changes()
+        ):
+            moved.add(obj.id)
+
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, User) and obj.id is not None]
+    if deleted:
+        # Their reports lose their manager in this flush; re-link them after it
+        connection = session.connection()
+        moved.update(user_id for user_id, in connection.execute(
+            select(OrgClosure.descendant_id).where(OrgClosure.ancestor_id.in_(deleted), OrgClosure.depth == 1)
+        ))
+        moved.difference_update(deleted)
+        connection.execute(delete(OrgClosure).where(
+            OrgClosure.ancestor_id.in_(deleted) | OrgClosure.descendant_id.in_(deleted)
+        ))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _maintain_org_closure(session, flush_context):
+    moved = session.info.pop('org_moved', set())
+    new_users = {obj.id: obj.manager_id for obj in session.new if isinstance(obj, User)}
+    if not new_users and not moved:
+        return
+    connection = session.connection()
+
+    # Managers created in the same flush are linked before their reports
+    while new_users:
+        ready = [user_id for user_id, manager_id in new_users.items() if manager_id not in new_users]
+        if not ready:
+            raise ReportingCycle('New users report to each other in a cycle')
+        for user_id in ready:
+            _insert_user(connection, user_id, new_users.pop(user_id))
+
+    if moved:
+        managers = dict(connection.execute(select(User.id, User.manager_id).where(User.id.in_(moved))).all())
+        for user_id in sorted(moved):
+            if user_id in managers:
+                _move_user(connection, user_id, managers[user_id])
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_reporting_changes(session):
+    session.info.pop('org_moved', None)
+
+
+# --- LOOKUPS ---
+
+def manages(manager_id, user_id):
+    """True if user_id reports to manager_id directly or further down the chain."""
+    return db.session.execute(
+        select(OrgClosure.depth)
+        .where(OrgClosure.ancestor_id == manager_id, OrgClosure.descendant_id == user_id, OrgClosure.depth > 0)
+    ).first() is not None
+
+
+def ancestor_ids(user_id):
+    """Ids of everyone user_id reports to, directly or further up, nearest first."""
+    return db.session.execute(
+        select(OrgClosure.ancestor_id)
+        .where(OrgClosure.descendant_id == user_id, OrgClosure.depth > 0)
+        .order_by(OrgClosure.depth)
+    ).scalars().all()
+
+
+def org_member_ids(manager_id, max_depth=None, include_self=False):
+    """Subquery of the ids below manager_id (at most max_depth levels down)."""
+    query = select(OrgClosure.descendant_id).where(OrgClosure.ancestor_id == manager_id)
+    if not include_self:
+        query = query.where(OrgClosure.depth > 0)
+    if max_depth is not None:
+        query = query.where(OrgClosure.depth <= max_depth)
+    return query
+
+
+def org_members_query(manager_id):
+    """Users below manager_id, nearest levels first."""
+    return User.query \
+        .join(OrgClosure, OrgClosure.descendant_id == User.id) \
+        .filter(OrgClosure.ancestor_id == manager_id, OrgClosure.depth > 0) \
+        .order_by(OrgClosure.depth, User.full_name)
+
+
+def org_goals_query(manager_id, max_depth=None):
+    """(Goal, owner name, depth below manager_id) for every goal in the manager's org."""
+    query = db.session.query(Goal, User.full_name, OrgClosure.depth) \
+        .join(OrgClosure, OrgClosure.descendant_id == Goal.user_id) \
+        .join(User, User.id == Goal.user_id) \
+        .filter(OrgClosure.ancestor_id == manager_id, OrgClosure.depth > 0)
+    if max_depth is not None:
+        query = query.filter(OrgClosure.depth <= max_depth)
+    return query
+
+
+# --- FULL REBUILD ---
+
+def rebuild_org_closure():
+    """Recomputes OrgClosure from User.manager_id. Returns the number of rows. The caller commits."""
+    db.session.execute(delete(OrgClosure))
+    columns = ['ancestor_id', 'descendant_id', 'depth']
+    db.session.execute(insert(OrgClosure).from_select(columns, select(User.id, User.id, literal(0))))
+    tree = org_tree_cte()
+    db.session.execute(insert(OrgClosure).from_select(
+        columns, select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)
+    ))
+    return db.session.query(OrgClosure).count()
+
+
+@app.cli.command('rebuild-org-closure')
+def rebuild_org_closure_command():
+    """Rebuild the reporting hierarchy closure table from User.manager_id."""
+    rows = rebuild_org_closure()
+    db.session.commit()
+    print(f'Rebuilt the reporting hierarchy: {rows} ancestor/descendant pairs.')
@@ -0,0 +1,119 @@
+import base64
+import binascii
+import heapq
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app import db
+from app.models import User, ProgressUpdate, ProgressUpdateArchive, ProgressArchiveSummary
+
+# Keyset pagination for a goal's audit trail.
+#
+# Updates are ordered newest first by (timestamp, id). A page ends with an
+# opaque cursor encoding the last (timestamp, id) seen, and the next page
+# continues strictly after it, so every page is a single index range scan on
+# (goal_id, timestamp) no matter how far back the client has paged.
+#
+# Updates moved to progress_update_archive (app/archive.py) are read
+# transparently: the archive is only queried once a page reaches back to
+# the goal's newest archived update, and its rows are merged in by the same
+# ordering.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, update_id):
+    raw = f'{timestamp.isoformat()}|{update_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, update_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(update_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}') from error
+
+
+def history_query(goal_id, cursor=None, model=ProgressUpdate):
+    """
+    Rows of (id, update_value, comment, proof_url, timestamp, author name),
+    newest first, with the author joined in instead of lazy-loaded per row.
+    `model` is ProgressUpdate or ProgressUpdateArchive.
+    """
+    query = db.session.query(
+        model.id,
+        model.update_value,
+        model.comment,
+        model.proof_url,
+        model.timestamp,
+        User.full_name
+    ).outerjoin(User, User.id == model.user_id) \
+        .filter(model.goal_id == goal_id)
+
+    if cursor is not None:
+        timestamp, update_id = cursor
+        query = query.filter(
+            model.timestamp <= timestamp,
+            or_(
+                model.timestamp < timestamp,
+                and_(model.timestamp == timestamp, model.id < update_id)
+            )
+        )
+
+    return query.order_by(model.timestamp.desc(), model.id.desc())
+
+
+def _archive_summary(goal_id):
+    return db.session.query(ProgressArchiveSummary.last_timestamp) \
+        .filter(ProgressArchiveSummary.goal_id == goal_id).first()
+
+
+def _position(row):
+    return row.timestamp, row.id
+
+
+def serialize_update(row):
+    return {
+        'id': row.id,
+        'value': row.update_value,
+        'comment': row.comment,
+        'proof': row.proof_url,
+        'author': row.full_name,
+        'timestamp': row.timestamp.strftime('%d-%b-%Y %I:%M %p')
+    }
+
+
+def history_page(goal_id, cursor=None, limit=50):
+    """
+    One page of history as (entries, next_cursor); next_cursor is None on
+    the last page.
+    """
+    rows = history_query(goal_id, cursor).limit(limit + 1).all()
+    # A full page of hot rows all newer than anything archived needs no archive lookup
+    summary = _archive_summary(goal_id)
+    if summary is not None and (len(rows) <= limit or rows[limit - 1].timestamp <= summary.last_timestamp):
+        archived = history_query(goal_id, cursor, ProgressUpdateArchive).limit(limit + 1).all()
+        rows = heapq.nlargest(limit + 1, rows + archived, key=_position)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return [serialize_update(row) for row in rows], next_cursor
+
+
+def iter_history(goal_id, cursor=None, batch_size=500):
+    """
+    Streams the history from the cursor onwards in batches, using a
+    server-side cursor where the driver supports one.
+    """
+    rows = history_query(goal_id, cursor).execution_options(yield_per=batch_size)
+    if _archive_summary(goal_id) is not None:
+        archived = history_query(goal_id, cursor, ProgressUpdateArchive).execution_options(yield_per=batch_size)
+        rows = heapq.merge(rows, archived, key=_position, reverse=True)
+    for row in rows:
+        yield serialize_update(row)
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g, session
+from sqlalchemy import event, inspect, select
+from app import db
+from app.models import User
+from app.transactions import commit_handler, on_commit
+
+# Identity of the logged-in user.
+#
+# A before_request hook resolves session['user_id'] into a small immutable
+# Identity (id, role, manager_id, league, full_name) stored on g.identity.
+# Identities are kept in a bounded per-process cache with a short TTL, so most
+# requests authorize without touching the user table. Committed changes to
+# those columns (league promotions in User.update_league(), role changes,
+# reassignments) evict the user's entry; the TTL bounds how long another
+# worker process can serve a stale one.
+#
+# Routes that render the full user (templates, user.reports, ...) load the
+# ORM object on demand with current_user().
+
+Identity = namedtuple('Identity', 'id role manager_id league full_name')
+
+_IDENTITY_COLUMNS = ('role', 'manager_id', 'manager', 'league', 'full_name')
+
+
+class IdentityCache:
+    def __init__(self, app=None):
+        self.ttl = 30
+        self.max_entries = 10000
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['identity_cache'] = self
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 30)
+        self.max_entries = app.config.get('IDENTITY_CACHE_MAX_ENTRIES', 10000)
+        app.before_request(load_identity)
+
+    def get(self, user_id):
+        """Identity for user_id, or None if the user doesn't exist."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] >= now:
+                self.entries.move_to_end(user_id)
+                return entry[1]
+
+        row = db.session.execute(
+            select(User.id, User.role, User.manager_id, User.league, User.full_name)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        if self.ttl:
+            with self.lock:
+                self.entries[user_id] = (now + self.ttl, identity)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def load_identity():
+    g.identity = None
+    user_id = session.get('user_id')
+    if user_id is not None:
+        g.identity = identity_cache.get(user_id)
+        if g.identity is None:
+            # The account was deleted after logging in
+            session.pop('user_id', None)
+
+
+def current_user():
+    """The logged-in user as an ORM object, loaded at most once per request."""
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, g.identity.id) if g.get('identity') else None
+    return g.current_user
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_identity_changes(session, flush_context):
+    changed = {
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and any(
+            inspect(obj).attrs[key].history.has_changes() for key in _IDENTITY_COLUMNS
+        )
+    }
+    changed.update(obj.id for obj in session.deleted if isinstance(obj, User))
+    if changed:
+        on_commit(session, 'identity_changes', changed)
+
+
+@commit_handler('identity_changes')
+def _invalidate_identities(changed):
+    identity_cache.invalidate(changed)
@@ -0,0 +1,96 @@
+import heapq
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Per-request SQL instrumentation.
+#
+# When SQL_INSTRUMENTATION is enabled, every statement run during a request is
+# counted and timed. The totals go into a Server-Timing response header, and
+# requests or statements slower than the configured thresholds are logged
+# together with the slowest statements. When disabled, no event listeners are
+# installed, so the only cost is the config check at startup.
+
+
+class RequestStats:
+    def __init__(self, keep):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.keep = keep
+        self.slowest = []  # min-heap of (duration, statement)
+
+    def record(self, statement, duration):
+        self.query_count += 1
+        self.db_time += duration
+        entry = (duration, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def slowest_statements(self):
+        return sorted(self.slowest, reverse=True)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context, so a statement that
+    # raises leaves nothing behind on the pooled connection
+    context._query_start = time.perf_counter()
+
+
+def _make_after_cursor_execute(app):
+    slow_query_ms = app.config['SLOW_QUERY_MS']
+
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_start
+        if has_request_context() and 'sql_stats' in g:
+            g.sql_stats.record(statement, duration)
+        if duration * 1000 >= slow_query_ms:
+            app.logger.warning('Slow query (%.1f ms): %s', duration * 1000, statement)
+
+    return _after_cursor_execute
+
+
+def init_instrumentation(app, db):
+    if not app.config.get('SQL_INSTRUMENTATION'):
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    after_cursor_execute = _make_after_cursor_execute(app)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    keep = app.config['SLOW_QUERY_LOG_COUNT']
+    slow_request_ms = app.config['SLOW_REQUEST_MS']
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = RequestStats(keep)
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.db_time * 1000
+        if app.config['SERVER_TIMING_HEADER']:
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.1f};desc="{stats.query_count} queries", app;dur={total_ms:.1f}'
+            )
+
+        if total_ms >= slow_request_ms:
+            slowest = '\n'.join(
+                f'  {duration * 1000:8.1f} ms  {statement}'
+                for duration, statement in stats.slowest_statements()
+            )
+            app.logger.warning(
+                'Slow request %s %s: %.1f ms, %d queries, %.1f ms in the database\n%s',
+                request.method, request.path, total_ms, stats.query_count, db_ms, slowest
+            )
+        return response
@@ -0,0 +1,323 @@
+import os
+import threading
+import time
+from sqlalchemy import event, inspect, select, func
+from app import db
+from app.models import User, Goal, UserScore
+from app.transactions import commit_handler, on_commit
+
+# In-memory leaderboards: global, per league and per manager's team.
+#
+# Performance scores are integers from 0 to 100, so each board keeps its
+# users in one bucket per score value plus a Fenwick tree of the bucket sizes.
+# A user's rank (1 + the number of users scoring strictly higher) is a prefix
+# sum, and the position where a page of the top-K list starts is a Fenwick
+# descent; both are O(log 101). Ties are listed by user id.
+#
+# The boards are built from the score store at startup (app/startup.py; a
+# process that skipped preloading builds them on its first read) and then
+# kept current: committed flushes that touch a user's goals or their
+# league/manager/role mark the user stale, and the next read reloads just
+# those users with one query. Bulk statements that bypass the session call
+# mark_stale() themselves. Other worker processes' writes are picked up by a
+# background thread that rebuilds the boards every LEADERBOARD_REBUILD_SECONDS
+# and swaps them in; reads keep using the old boards meanwhile.
+#
+# Administrators are not ranked.
+
+MAX_SCORE = 100
+
+_LEADERBOARD_COLUMNS = ('full_name', 'role', 'league', 'manager_id', 'manager')
+
+
+class ScoreBoard:
+    """Users ranked by an integer score in [0, MAX_SCORE]."""
+
+    def __init__(self):
+        # Slot i (1-based) of the tree holds score MAX_SCORE + 1 - i, so
+        # prefix sums count the users scoring at least a given value
+        self.tree = [0] * (MAX_SCORE + 2)
+        self.buckets = {}
+        self.scores = {}
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _add_count(self, score, amount):
+        slot = MAX_SCORE - score + 1
+        while slot < len(self.tree):
+            self.tree[slot] += amount
+            slot += slot & -slot
+
+    def _count_at_least(self, score):
+        slot = MAX_SCORE - score + 1
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def add(self, user_id, score):
+        score = min(max(int(score), 0), MAX_SCORE)
+        old_score = self.scores.get(user_id)
+        if old_score == score:
+            return
+        if old_score is not None:
+            self.remove(user_id)
+        self.scores[user_id] = score
+        self.buckets.setdefault(score, set()).add(user_id)
+        self._sorted.pop(score, None)
+        self._add_count(score, 1)
+
+    def remove(self, user_id):
+        score = self.scores.pop(user_id, None)
+        if score is None:
+            return
+        bucket = self.buckets[score]
+        bucket.discard(user_id)
+        if not bucket:
+            del self.buckets[score]
+        self._sorted.pop(score, None)
+        self._add_count(score, -1)
+
+    def rank(self, user_id):
+        """1-based rank (tied users share one), or None if not on the board."""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return (self._count_at_least(score + 1) if score < MAX_SCORE else 0) + 1
+
+    def _score_at(self, position):
+        """Score of the user at 0-based `position` in ranking order."""
+        slot = 0
+        remaining = position + 1
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            following = slot + step
+            if following < len(self.tree) and self.tree[following] < remaining:
+                slot = following
+                remaining -= self.tree[following]
+            step >>= 1
+        # slot + 1 is the first slot whose prefix sum reaches position + 1
+        return MAX_SCORE - slot
+
+    def _bucket(self, score):
+        ordered = self._sorted.get(score)
+        if ordered is None:
+            ordered = self._sorted[score] = sorted(self.buckets.get(score, ()))
+        return ordered
+
+    def top(self, limit, offset=0):
+        """[(rank, user_id, score)] for `limit` users starting at `offset`."""
+        if offset >= len(self.scores) or limit <= 0:
+            return []
+        score = self._score_at(offset)
+        # Users ahead of this score's bucket
+        ahead = self._count_at_least(score + 1) if score < MAX_SCORE else 0
+        skip = offset - ahead
+        entries = []
+        while score >= 0 and len(entries) < limit:
+            if score in self.buckets:
+                rank = ahead + 1
+                for user_id in self._bucket(score)[skip:skip + limit - len(entries)]:
+                    entries.append((rank, user_id, score))
+                ahead += len(self.buckets[score])
+                skip = 0
+            score -= 1
+        return entries
+
+
+class BoardSet:
+    """The global board, one board per league and one per manager's team."""
+
+    def __init__(self):
+        self.members = {}
+        self.overall = ScoreBoard()
+        self.leagues = {}
+        self.teams = {}
+
+    def place(self, user_id, row):
+        """Moves a user to where `row` (a Leaderboards query row, or None) puts them."""
+        member = self.members.pop(user_id, None)
+        if member is not None:
+            _, league, manager_id, _ = member
+            self.overall.remove(user_id)
+            self.leagues[league].remove(user_id)
+            if manager_id is not None:
+                self.teams[manager_id].remove(user_id)
+        if row is None or row.role == 'Administrator':
+            return
+
+        _, full_name, _, league, manager_id, score = row
+        self.members[user_id] = (full_name, league, manager_id, score)
+        self.overall.add(user_id, score)
+        self.leagues.setdefault(league, ScoreBoard()).add(user_id, score)
+        if manager_id is not None:
+            self.teams.setdefault(manager_id, ScoreBoard()).add(user_id, score)
+
+    def board(self, scope, key=None):
+        if scope == 'global':
+            return self.overall
+        if scope == 'league':
+            return self.leagues.get(key) or ScoreBoard()
+        if scope == 'team':
+            return self.teams.get(key) or ScoreBoard()
+        raise ValueError(f'Unknown leaderboard: {scope!r}')
+
+
+class Leaderboards:
+    def __init__(self, app=None):
+        self.app = None
+        self.rebuild_seconds = 300
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.boards = None
+        self.generation = 0
+        self.stale = set()
+        # Users marked stale while a rebuild reads its snapshot
+        self.marked_during_build = None
+        self.refresher_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['leaderboards'] = self
+        self.rebuild_seconds = app.config.get('LEADERBOARD_REBUILD_SECONDS', 300)
+
+    # --- Maintenance ---
+
+    def _query(self):
+        return select(
+            User.id, User.full_name, User.role, User.league, User.manager_id,
+            func.coalesce(UserScore.performance_score, 0)
+        ).outerjoin(UserScore, UserScore.user_id == User.id)
+
+    def build(self):
+        """
+        Loads every board from the score store and swaps them in. Reads are
+        served from the previous boards until then. Needs an app context.
+        """
+        with self.build_lock:
+            self._build()
+
+    def _build(self):
+        with self.lock:
+            generation = self.generation
+            self.marked_during_build = set()
+        boards = BoardSet()
+        try:
+            for row in db.session.execute(self._query()):
+                boards.place(row[0], row)
+        finally:
+            with self.lock:
+                marked, self.marked_during_build = self.marked_during_build, None
+        with self.lock:
+            # A reset() meanwhile means the snapshot predates a bulk load
+            if generation == self.generation:
+                self.boards = boards
+                # ... and it may predate these users' latest commits
+                self.stale.update(marked)
+
+    def _refresh(self):
+        stale = list(self.stale)
+        self.stale = set()
+        if self.marked_during_build is not None:
+            self.marked_during_build.update(stale)
+        rows = {}
+        for start in range(0, len(stale), 500):
+            chunk = stale[start:start + 500]
+            rows.update((row[0], row) for row in db.session.execute(self._query().where(User.id.in_(chunk))))
+        for user_id in stale:
+            self.boards.place(user_id, rows.get(user_id))
+
+    def _rebuild_periodically(self):
+        while True:
+            time.sleep(self.rebuild_seconds)
+            with self.app.app_context():
+                # Nobody waits on this thread, so failures are logged here
+                try:
+                    self.build()
+                except Exception:
+                    self.app.logger.exception('Leaderboard rebuild failed')
+                finally:
+                    db.session.remove()
+
+    def _start_refresher(self):
+        # Threads don't survive a fork, so every worker starts its own
+        with self.lock:
+            if self.refresher_pid == os.getpid():
+                return
+            self.refresher_pid = os.getpid()
+        threading.Thread(target=self._rebuild_periodically, name='leaderboard-rebuild', daemon=True).start()
+
+    def mark_stale(self, user_ids):
+        with self.lock:
+            self.stale.update(user_ids)
+            if self.marked_during_build is not None:
+                self.marked_during_build.update(user_ids)
+
+    def reset(self):
+        """Drops the boards; they are rebuilt on the next read (after bulk loads)."""
+        with self.lock:
+            self.generation += 1
+            self.boards = None
+            self.stale = set()
+
+    # --- Reads ---
+
+    def standings(self, scope, key=None, limit=10, offset=0, user_id=None):
+        """
+        Top `limit` entries (from `offset`) of a board, plus `user_id`'s own
+        rank and score when they are on it. `key` is the league name or the
+        manager id for the 'league' and 'team' boards.
+        """
+        self._start_refresher()
+        if self.boards is None:
+            with self.build_lock:
+                if self.boards is None:
+                    self._build()
+        with self.lock:
+            if self.boards is None:
+                # reset() by a bulk load in this process right now
+                return {'size': 0, 'top': [], 'me': None}
+            if self.stale:
+                self._refresh()
+            members = self.boards.members
+            board = self.boards.board(scope, key)
+            entries = [{
+                'rank': rank, 'user_id': member_id, 'name': members[member_id][0],
+                'league': members[member_id][1], 'score': score,
+            } for rank, member_id, score in board.top(limit, offset)]
+            rank = board.rank(user_id) if user_id is not None else None
+            me = {'rank': rank, 'score': board.scores[user_id]} if rank is not None else None
+            return {'size': len(board), 'top': entries, 'me': me}
+
+
+leaderboards = Leaderboards()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_leaderboard_changes(session, flush_context):
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Goal):
+            history = inspect(obj).attrs.user_id.history
+            user_ids.update(history.added or history.unchanged or ())
+            user_ids.update(history.deleted or ())
+        elif isinstance(obj, User):
+            state = inspect(obj)
+            if obj in session.dirty and not any(
+                state.attrs[key].history.has_changes() for key in _LEADERBOARD_COLUMNS
+            ):
+                continue
+            user_ids.add(obj.id)
+    user_ids.discard(None)
+    if user_ids:
+        on_commit(session, 'leaderboard_changes', user_ids)
+
+
+@commit_handler('leaderboard_changes')
+def _mark_leaderboard_changes(changed):
+    leaderboards.mark_stale(changed)
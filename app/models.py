@@ -1,6 +1,47 @@
 from datetime import datetime
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import case, cast, func, Float
+from werkzeug.security import check_password_hash
+from app.passwords import password_hasher
+
+
+def score_from_goals(goals):
+    """Weighted performance score (0-100) for an already loaded list of goals."""
+    total_weighted_progress = 0
+    total_weight = 0
+
+    for goal in goals:
+        total_weighted_progress += goal.get_progress() * goal.weight
+        total_weight += goal.weight
+
+    if total_weight == 0:
+        return 0
+
+    return int(total_weighted_progress / total_weight)
+
+
+def league_for_score(score, current_league):
+    """League earned by a score; below the Silver threshold the current league is kept."""
+    if score >= 90:
+        return 'Diamond'
+    if score >= 75:
+        return 'Gold'
+    if score >= 50:
+        return 'Silver'
+    return current_league
+
+
+def score_totals_query():
+    """
+    Query yielding (user_id, weighted progress sum, weight sum) per user,
+    computed entirely in SQL. Filter it further to restrict the users.
+    """
+    return db.session.query(
+        Goal.user_id,
+        func.sum(Goal.progress_expression() * Goal.weight),
+        func.sum(Goal.weight)
+    ).group_by(Goal.user_id)
+
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,7 +51,7 @@ class User(db.Model):
     role = db.Column(db.String(64), index=True, default='Employee')
     league = db.Column(db.String(64), nullable=False, default='Bronze')
 
-    manager_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    manager_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
 
     goals = db.relationship('Goal', backref='employee', lazy='dynamic')
     reports = db.relationship('User', backref=db.backref('manager', remote_side=[id]), lazy='dynamic')
@@ -19,64 +60,65 @@ class User(db.Model):
     progress_updates = db.relationship('ProgressUpdate', backref='author', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-    def calculate_performance_score(self):
-        my_goals = self.goals.all()
-        if not my_goals:
-            return 0
-
-        total_weighted_progress = 0
-        total_weight = 0
-
-        for goal in my_goals:
-            total_weighted_progress += goal.get_progress() * goal.weight
-            total_weight += goal.weight
-
-        if total_weight == 0:
-            return 0
-            
-        final_score = int(total_weighted_progress / total_weight)
-        return final_score
+    def cached_performance_score(self):
+        # Primary-key lookup in the score store maintained by app/scores.py
+        record = db.session.get(UserScore, self.id, populate_existing=True)
+        return record.performance_score if record else 0
     
     def update_league(self):
-        score = self.calculate_performance_score()
-        new_league = self.league # Default to current league
-        if score >= 90:
-            new_league = 'Diamond'
-        elif score >= 75:
-            new_league = 'Gold'
-        elif score >= 50:
-            new_league = 'Silver'
+        score = self.cached_performance_score()
+        new_league = league_for_score(score, self.league) # Defaults to current league
         
         # We won't flash a message here anymore, as it's a background process.
         # The new league will be visible on the next page load.
+        # The caller commits (see app/tasks.py).
         if new_league != self.league:
             self.league = new_league
-            db.session.commit()
 
     def __repr__(self):
         return f'<User {self.full_name}>'
 
 class Goal(db.Model):
+    __table_args__ = (
+        # Serves both user.goals lookups and the per-user lists sorted by status
+        db.Index('ix_goal_user_id_status', 'user_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(250), nullable=False)
     description = db.Column(db.Text)
     kpi_name = db.Column(db.String(100))
-    current_value = db.Column(db.Integer, default=0)
-    target_value = db.Column(db.Integer, nullable=False, default=100)
-    weight = db.Column(db.Integer, nullable=False, default=5)
+    # active_history: the score store (app/scores.py) needs the committed
+    # value even when one of these is assigned while expired
+    current_value = db.column_property(db.Column(db.Integer, default=0), active_history=True)
+    target_value = db.column_property(db.Column(db.Integer, nullable=False, default=100), active_history=True)
+    weight = db.column_property(db.Column(db.Integer, nullable=False, default=5), active_history=True)
     status = db.Column(db.String(64), index=True, default='In Progress')
     due_date = db.Column(db.DateTime)
     manager_feedback = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('user.id')), active_history=True)
+
+    # Bumped on every change to the row; used to build ETags (see app/etags.py)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationship to the new ProgressUpdate model
     updates = db.relationship('ProgressUpdate', backref='goal', lazy='dynamic', cascade="all, delete-orphan")
 
+    @classmethod
+    def progress_expression(cls):
+        """SQL equivalent of get_progress(), usable inside aggregates."""
+        progress = (cast(func.coalesce(cls.current_value, 0), Float) / cls.target_value) * 100
+        return case(
+            (cls.target_value == 0, 100),
+            (progress > 100, 100),
+            else_=progress
+        )
+
     def get_progress(self):
         if self.target_value == 0:
             return 100
@@ -86,6 +128,52 @@ class Goal(db.Model):
     def __repr__(self):
         return f'<Goal {self.title}>'
 
+# --- DENORMALIZED SCORE STORE ---
+# Kept up to date incrementally by app/scores.py whenever goals change, so that
+# read paths can look scores up instead of aggregating raw Goal rows.
+class UserScore(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_weight = db.Column(db.Integer, nullable=False, default=0)
+    weighted_progress = db.Column(db.Float, nullable=False, default=0)
+    performance_score = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserScore {self.user_id}: {self.performance_score}>'
+
+class TeamScore(db.Model):
+    # Rollup over the goals of a manager's direct reports.
+    manager_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_weight = db.Column(db.Integer, nullable=False, default=0)
+    weighted_progress = db.Column(db.Float, nullable=False, default=0)
+    avg_progress = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TeamScore {self.manager_id}: {self.avg_progress}>'
+
+# --- DAILY PROGRESS ROLLUPS ---
+# Filled incrementally by app/analytics.py as progress is reported; used for
+# trend charts so they never have to scan the raw audit trail.
+class GoalDailyProgress(db.Model):
+    goal_id = db.Column(db.Integer, db.ForeignKey('goal.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    update_count = db.Column(db.Integer, nullable=False, default=0)
+    closing_value = db.Column(db.Integer) # value of the last update that day
+    closing_progress = db.Column(db.Float) # ... as a percentage of the target
+
+    def __repr__(self):
+        return f'<GoalDailyProgress {self.goal_id} {self.day}>'
+
+class UserDailyProgress(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    update_count = db.Column(db.Integer, nullable=False, default=0)
+    # Change of the user's weighted progress sum (UserScore.weighted_progress) that day
+    weighted_delta = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserDailyProgress {self.user_id} {self.day}>'
+
 # --- NEW MODEL FOR AUDIT TRAIL ---
 class ProgressUpdate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -95,9 +183,64 @@ class ProgressUpdate(db.Model):
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     
     # Foreign Keys
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     goal_id = db.Column(db.Integer, db.ForeignKey('goal.id'))
 
     def __repr__(self):
         return f'<ProgressUpdate {self.id} for Goal {self.goal_id}>'
 
+# Serves goal.updates lookups and the newest-first goal history
+db.Index(
+    'ix_progress_update_goal_id_timestamp',
+    ProgressUpdate.goal_id, ProgressUpdate.timestamp.desc()
+)
+
+# --- ARCHIVED AUDIT TRAIL ---
+# Progress updates older than ARCHIVE_AFTER_DAYS are moved here by
+# app/archive.py (same ids and columns, plus the YYYY-MM period they belong
+# to) so the hot progress_update table stays small.
+class ProgressUpdateArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    update_value = db.Column(db.Integer, nullable=False)
+    comment = db.Column(db.Text, nullable=False)
+    proof_url = db.Column(db.String(500))
+    timestamp = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    goal_id = db.Column(db.Integer, db.ForeignKey('goal.id'))
+    period = db.Column(db.String(7), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ProgressUpdateArchive {self.id} for Goal {self.goal_id}>'
+
+db.Index(
+    'ix_progress_update_archive_goal_id_timestamp',
+    ProgressUpdateArchive.goal_id, ProgressUpdateArchive.timestamp.desc()
+)
+
+class ProgressArchiveSummary(db.Model):
+    # One row per goal with archived updates
+    goal_id = db.Column(db.Integer, db.ForeignKey('goal.id'), primary_key=True)
+    archived_count = db.Column(db.Integer, nullable=False, default=0)
+    first_timestamp = db.Column(db.DateTime)
+    last_timestamp = db.Column(db.DateTime)
+    last_update_id = db.Column(db.Integer) # newest archived update ...
+    last_value = db.Column(db.Integer) # ... and its value
+
+    def __repr__(self):
+        return f'<ProgressArchiveSummary {self.goal_id}: {self.archived_count}>'
+
+# --- REPORTING HIERARCHY ---
+# Closure of User.manager_id maintained by app/hierarchy.py: one row for every
+# (ancestor, descendant) pair in the reporting tree, including each user paired
+# with themselves at depth 0, so "is X above Y" and "everyone below X" are
+# single index lookups at any depth.
+class OrgClosure(db.Model):
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<OrgClosure {self.ancestor_id} > {self.descendant_id} ({self.depth})>'
+
+# Serves the "who is above this user" side of the closure
+db.Index('ix_org_closure_descendant_id_depth', OrgClosure.descendant_id, OrgClosure.depth)
@@ -0,0 +1,141 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing off the request threads.
+#
+# Checking a password hash is deliberately slow (scrypt by default). Logins run
+# the check on a small process pool, so a burst of sign-ins can't occupy the
+# request threads and starve ordinary page loads. At most
+# PASSWORD_HASH_MAX_PENDING checks may be running or waiting per app process.
+# Past that, PasswordPoolBusy is raised immediately and the login view answers
+# 503 with a Retry-After header instead of queueing more work.
+#
+# A hash made with older parameters than PASSWORD_HASH_METHOD is replaced
+# after a successful login. With PASSWORD_HASH_WORKERS = 0 everything runs
+# inline (tests).
+
+
+class PasswordPoolBusy(Exception):
+    """Every verification slot is taken; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Password verification is saturated; retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.workers = 2
+        self.max_pending = 8
+        self.timeout = 10
+        self.retry_after = 2
+        self.executor = None
+        self.slots = None
+        self.lock = threading.Lock()
+        self.reference_hash = None
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['password_hasher'] = self
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 8)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self.retry_after = app.config.get('PASSWORD_HASH_RETRY_AFTER', 2)
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        # A forked worker (gunicorn --preload) must start its own pool
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.executor = None
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                atexit.register(self.shutdown)
+            return self.executor
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise PasswordPoolBusy(self.retry_after)
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # The slot is held until the worker is done, even if we stop waiting
+        future.add_done_callback(lambda future: self.slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise PasswordPoolBusy(self.retry_after)
+        except BrokenProcessPool:
+            # A worker died; the next call starts a fresh pool
+            with self.lock:
+                self.executor = None
+            raise PasswordPoolBusy(self.retry_after)
+
+    def hash(self, password):
+        """New hash with the configured method (inline; for account setup)."""
+        return generate_password_hash(password, self.method)
+
+    def _reference(self):
+        # A hash made with the configured method: its prefix carries the
+        # current parameters, and unknown accounts are checked against it
+        if self.reference_hash is None:
+            self.reference_hash = self._run(generate_password_hash, '', self.method)
+        return self.reference_hash
+
+    def preload(self):
+        """Computes the reference hash inline, e.g. before forking workers."""
+        if self.reference_hash is None:
+            self.reference_hash = generate_password_hash('', self.method)
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with other parameters than the configured ones."""
+        return password_hash.split('$', 1)[0] != self._reference().split('$', 1)[0]
+
+    def verify(self, password_hash, password):
+        """
+        Checks `password` against `password_hash` (None for an unknown
+        account) on the pool. Returns (valid, new hash or None). Raises
+        PasswordPoolBusy when saturated.
+        """
+        if password_hash is None:
+            # Spend the same time as for a real account, so response times
+            # don't reveal which emails exist
+            self._run(check_password_hash, self._reference(), password or '')
+            return False, None
+
+        if not self._run(check_password_hash, password_hash, password or ''):
+            return False, None
+        try:
+            if self.needs_rehash(password_hash):
+                return True, self._run(generate_password_hash, password, self.method)
+        except PasswordPoolBusy:
+            # Upgrading the hash can wait for a quieter login
+            pass
+        return True, None
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,98 @@
+import functools
+import sqlite3
+import time
+import click
+from flask import current_app, g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Read-replica routing.
+#
+# When DATABASE_REPLICA_URL is configured it becomes the 'replica' bind, and
+# views decorated with @replica_reads send their SELECTs there. Everything
+# else stays on the primary: writes, flushes, anything issued outside a
+# decorated view, and every statement of a user who committed a write in the
+# last REPLICA_MAX_LAG_SECONDS (tracked in their session cookie), so the
+# page reloaded after update_goal shows the new progress even if the
+# replica is behind. Views cached while reading from the replica are kept
+# for at most that long too (see ViewCache.cached).
+#
+# Locally, two SQLite files work: point DATABASE_REPLICA_URL at a second file
+# and refresh it from the primary with `flask sync-replica`.
+
+REPLICA_BIND = 'replica'
+
+
+def served_from_replica():
+    """True while handling a request whose reads go to the replica."""
+    return has_request_context() and g.get('read_replica', False)
+
+
+class RoutingSession(Session):
+    """Session sending SELECTs of replica-routed requests to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and clause is not None
+                and getattr(clause, 'is_select', False) and served_from_replica()):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_reads(view):
+    """Routes a read-only view's queries to the replica, when one is configured."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        last_write = flask_session.get('last_write', 0)
+        g.read_replica = (
+            REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+            and time.time() - last_write > current_app.config['REPLICA_MAX_LAG_SECONDS']
+        )
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_replica(app, db):
+    from app.transactions import commit_handler, on_commit
+
+    @event.listens_for(db.session, 'after_flush')
+    def _remember_write(session, flush_context):
+        on_commit(session, 'last_write')
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def _remember_bulk_write(orm_execute_state):
+        # insert()/update() statements (the bulk endpoint) don't flush
+        if not orm_execute_state.is_select:
+            on_commit(orm_execute_state.session, 'last_write')
+
+    @commit_handler('last_write')
+    def _mark_last_write(items):
+        if has_request_context():
+            flask_session['last_write'] = time.time()
+
+    @app.cli.command('sync-replica')
+    def sync_replica_command():
+        """Copy the primary SQLite database onto the replica file."""
+        replica_url = app.config.get('SQLALCHEMY_BINDS', {}).get(REPLICA_BIND)
+        if not replica_url:
+            raise click.ClickException('DATABASE_REPLICA_URL is not set.')
+        sync_sqlite_replica(app.config['SQLALCHEMY_DATABASE_URI'], replica_url)
+        print(f'Replica {replica_url} refreshed from the primary.')
+
+
+def sync_sqlite_replica(primary_url, replica_url):
+    """Copies a SQLite primary onto a SQLite replica file (local testing)."""
+    primary = make_url(primary_url)
+    replica = make_url(replica_url)
+    if primary.get_backend_name() != 'sqlite' or replica.get_backend_name() != 'sqlite':
+        raise ValueError('sync-replica only copies between SQLite files; '
+                         'use the database server\'s replication otherwise')
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
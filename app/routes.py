@@ -1,23 +1,55 @@
-from flask import render_template, request, flash, redirect, url_for, session, abort, jsonify
+import json
+from flask import render_template, request, flash, redirect, url_for, session, abort, jsonify, Response, stream_with_context, g
 from app import app, db
-from app.models import User, Goal, ProgressUpdate # Import the new model
+from app.models import User, Goal, ProgressUpdate, OrgClosure, score_from_goals # Import the new model
+from app.aggregates import load_team_view, subtree_rollups
+from app.tasks import schedule_league_update
+from app.bulk import apply_bulk_updates
+from app.cache import view_cache, invalidate_users
+from app.etags import conditional_response, goal_history_etag, employee_goals_etag
+from app.history import history_page, iter_history, decode_cursor, InvalidCursor
+from app.identity import current_user
+from app.replica import replica_reads
+from app.analytics import team_trend
+from app.search import search
+from app.leaderboard import leaderboards
+from app.passwords import password_hasher, PasswordPoolBusy
+from app.events import event_broker, team_channel, publish_progress, publish_feedback
+from app.hierarchy import manages, ancestor_ids, org_members_query, org_goals_query
 from datetime import datetime
+from sqlalchemy import select, update
 
 @app.route('/', methods=['GET', 'POST'])
 @app.route('/login', methods=['GET', 'POST'])
 def login():
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-        if user.role == 'Administrator':
+    if g.identity is not None:
+        if g.identity.role == 'Administrator':
             return redirect(url_for('organization'))
         return redirect(url_for('dashboard'))
 
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
-        user = User.query.filter_by(email=email).first()
-
-        if user and user.check_password(password):
+        user = db.session.execute(
+            select(User.id, User.role, User.password_hash).where(User.email == email)
+        ).first()
+        # Don't keep the transaction (a write lock under BEGIN IMMEDIATE) open while hashing
+        db.session.rollback()
+
+        try:
+            valid, new_hash = password_hasher.verify(user.password_hash if user else None, password)
+        except PasswordPoolBusy as busy:
+            flash('Too many people are signing in right now. Please try again in a few seconds.')
+            return render_template('login.html', title='Sign In'), 503, {'Retry-After': str(busy.retry_after)}
+
+        if user and valid:
+            if new_hash:
+                # Hash parameters changed since this password was set
+                db.session.execute(
+                    update(User).where(User.id == user.id, User.password_hash == user.password_hash)
+                    .values(password_hash=new_hash)
+                )
+                db.session.commit()
             session['user_id'] = user.id
             session.permanent = False
             flash('Login successful!')
@@ -32,35 +64,35 @@ def login():
     return render_template('login.html', title='Sign In')
 
 @app.route('/dashboard')
+@replica_reads
 def dashboard():
-    if 'user_id' not in session:
+    if g.identity is None:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
-    if user.role == 'Administrator':
+    identity = g.identity
+    if identity.role == 'Administrator':
         return redirect(url_for('organization'))
 
+    # Served from the view cache until one of the user's goals (or, for
+    # managers, one of their reports) changes
+    tags = {f'user:{identity.id}'}
+    if identity.role == 'Manager':
+        tags.add(f'team:{identity.id}')
+    return view_cache.cached('dashboard', identity.id, tags, lambda: render_dashboard(current_user()))
+
+
+def render_dashboard(user):
     goals = user.goals.order_by(Goal.status.asc()).all()
-    score = user.calculate_performance_score()
+    score = score_from_goals(goals)
     
     reports_data = []
     chart_labels = []
     chart_data = []
     
     if user.role == 'Manager':
-        for report in user.reports:
-            report_score = report.calculate_performance_score()
-            # --- THIS IS THE FIX ---
-            # Sort the employee's goals here in the backend before sending to the template
-            sorted_employee_goals = report.goals.order_by(Goal.status.asc()).all()
-            
-            reports_data.append({
-                'employee': report, 
-                'score': report_score,
-                'sorted_goals': sorted_employee_goals # Pass the pre-sorted list to the template
-            })
-            chart_labels.append(report.full_name)
-            chart_data.append(report_score)
+        # Scores and pre-sorted goal lists for the whole team are loaded in
+        # a fixed number of queries instead of two queries per report.
+        reports_data, chart_labels, chart_data = load_team_view(user)
 
     return render_template(
         'dashboard.html', 
@@ -81,13 +113,13 @@ def logout():
 # --- OVERHAULED FOR PROOF OF UPDATE ---
 @app.route('/update_goal/<int:goal_id>', methods=['POST'])
 def update_goal(goal_id):
-    if 'user_id' not in session:
+    if g.identity is None:
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
 
     goal = Goal.query.get_or_404(goal_id)
-    user = User.query.get(session['user_id'])
+    user_id = g.identity.id
 
-    if goal.employee.id != user.id:
+    if goal.user_id != user_id:
         return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
     # Get data from the new modal form
@@ -104,7 +136,7 @@ def update_goal(goal_id):
         update_value=progress,
         comment=comment,
         proof_url=proof_url,
-        author=user,
+        user_id=user_id,
         goal=goal
     )
     db.session.add(new_update)
@@ -112,53 +144,102 @@ def update_goal(goal_id):
     # 2. Update the goal's main values
     goal.current_value = progress
     goal.status = status
-    
+
+    # 3. Check for league promotion (in the background after the commit,
+    # or right here in sync mode)
+    schedule_league_update(user_id)
+
+    # Summary for the manager's live dashboard (see app/events.py), taken
+    # before the commit expires the objects
+    db.session.flush()
+    update_summary = {
+        'id': new_update.id, 'comment': comment, 'proof_url': proof_url,
+        'timestamp': new_update.timestamp.strftime('%d-%b-%Y %I:%M %p'),
+    }
     db.session.commit()
-    
-    # 3. Check for league promotion
-    user.update_league()
-    db.session.commit() # Commit the league change
+    publish_progress(ancestor_ids(user_id), goal_id, user_id, progress, status, update_summary)
     
     return jsonify({'success': True, 'message': 'Progress updated successfully!'})
 
 
+
+@app.route('/update_goals', methods=['POST'])
+def update_goals():
+    """
+    Bulk version of update_goal for clients syncing many updates at once.
+    Expects a JSON array of {goal_id, progress, status, comment, proof_url}
+    and reports success or failure for each item.
+    """
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'Expected a JSON array of updates.'}), 400
+    if len(items) > app.config['BULK_UPDATE_MAX_ITEMS']:
+        return jsonify({'success': False, 'message': f"At most {app.config['BULK_UPDATE_MAX_ITEMS']} updates per request."}), 400
+
+    user_id = g.identity.id
+    results = apply_bulk_updates(user_id, items)
+    updated = sum(1 for result in results if result['success'])
+    if updated:
+        schedule_league_update(user_id)
+    db.session.commit()
+    if updated:
+        # The bulk statements bypass the session hooks that invalidate the cache
+        invalidate_users([user_id])
+        leaderboards.mark_stale([user_id])
+        timestamp = datetime.utcnow().strftime('%d-%b-%Y %I:%M %p')
+        managers = ancestor_ids(user_id)
+        for result in results:
+            if result['success']:
+                item = items[result['index']]
+                publish_progress(managers, result['goal_id'], user_id, int(item['progress']),
+                                 item.get('status'), {'id': None, 'comment': item['comment'],
+                                                      'proof_url': item.get('proof_url'), 'timestamp': timestamp})
+
+    return jsonify({
+        'success': updated == len(items),
+        'updated': updated,
+        'failed': len(items) - updated,
+        'results': results
+    })
+
+
 @app.route('/organization')
+@replica_reads
 def organization():
-    if 'user_id' not in session:
+    if g.identity is None:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
-    if user.role != 'Administrator':
+    if g.identity.role != 'Administrator':
         abort(403)
 
+    return view_cache.cached('organization', g.identity.id, {'org'}, lambda: render_organization(current_user()))
+
+
+def render_organization(user):
     managers = User.query.filter_by(role='Manager').all()
-    
-    managers_data = []
-    for manager in managers:
-        team_goals = []
-        for employee in manager.reports:
-            team_goals.extend(employee.goals.all())
-        
-        if team_goals:
-            total_progress = sum(goal.get_progress() * goal.weight for goal in team_goals)
-            total_weight = sum(goal.weight for goal in team_goals)
-            average_progress = int(total_progress / total_weight) if total_weight > 0 else 0
-        else:
-            average_progress = 0
-            
-        managers_data.append({'info': manager, 'avg_progress': average_progress})
+
+    # Progress of each manager's whole reporting tree (all levels below them),
+    # aggregated in a single recursive query
+    rollups = subtree_rollups(manager.id for manager in managers)
+    managers_data = [
+        {'info': manager, 'avg_progress': rollups.get(manager.id, {}).get('avg_progress', 0)}
+        for manager in managers
+    ]
     
     return render_template('organization.html', title='Organizational View', user=user, managers_data=managers_data)
 
 
 @app.route('/create_goal', methods=['GET', 'POST'])
 def create_goal():
-    if 'user_id' not in session:
+    if g.identity is None:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
-    if user.role not in ['Manager', 'Administrator']:
+    if g.identity.role not in ['Manager', 'Administrator']:
         abort(403)
+    user = current_user()
 
     if request.method == 'POST':
         title = request.form.get('title')
@@ -171,7 +252,7 @@ def create_goal():
         assignee = User.query.get(assignee_id)
         
         is_authorized = False
-        if user.role == 'Manager' and assignee and assignee.manager_id == user.id:
+        if user.role == 'Manager' and assignee and manages(user.id, assignee.id):
             is_authorized = True
         if user.role == 'Administrator' and assignee and assignee.role == 'Manager':
             is_authorized = True
@@ -197,96 +278,349 @@ def create_goal():
 
     assignees = []
     if user.role == 'Manager':
-        assignees = user.reports.all()
+        # Anyone in the manager's org, direct reports first
+        assignees = org_members_query(user.id).all()
     elif user.role == 'Administrator':
         assignees = User.query.filter_by(role='Manager').all()
         
     return render_template('create_goal.html', title='Create New Goal', assignees=assignees, user=user)
 
 
+def load_goal_with_manager(goal_id, manager_id):
+    """
+    Loads a goal together with its owner's manager_id and whether the owner
+    is below `manager_id` (at any depth) in one query, for permission checks
+    that would otherwise lazy load goal.employee.
+    """
+    row = db.session.query(Goal, User.manager_id, OrgClosure.depth) \
+        .outerjoin(User, User.id == Goal.user_id) \
+        .outerjoin(OrgClosure, (OrgClosure.descendant_id == Goal.user_id)
+                   & (OrgClosure.ancestor_id == manager_id) & (OrgClosure.depth > 0)) \
+        .filter(Goal.id == goal_id).first()
+    if row is None:
+        abort(404)
+    goal, owner_manager_id, depth = row
+    return goal, owner_manager_id, depth is not None
+
+
 @app.route('/add_feedback/<int:goal_id>', methods=['POST'])
 def add_feedback(goal_id):
-    if 'user_id' not in session:
+    if g.identity is None:
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
     
-    user = User.query.get(session['user_id'])
-    if user.role != 'Manager':
+    if g.identity.role != 'Manager':
         return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
-    goal = Goal.query.get_or_404(goal_id)
-    if goal.employee.manager_id != user.id:
+    # Direct and skip-level managers may leave feedback
+    goal, _, in_org = load_goal_with_manager(goal_id, g.identity.id)
+    if not in_org:
         return jsonify({'success': False, 'message': 'Permission denied'}), 403
     
     feedback_text = request.form.get('feedback')
     goal.manager_feedback = feedback_text
+    owner_id = goal.user_id
     db.session.commit()
+    publish_feedback(ancestor_ids(owner_id), goal_id, feedback_text)
     
     return jsonify({'success': True, 'message': 'Feedback submitted successfully!'})
 
 
 @app.route('/profile')
+@replica_reads
 def profile():
-    if 'user_id' not in session:
+    if g.identity is None:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
-    score = user.calculate_performance_score()
-    
-    return render_template('profile.html', title='My Profile', user=user, score=score)
+    user_id = g.identity.id
+
+    def render_profile():
+        user = current_user()
+        score = user.cached_performance_score()
+        return render_template('profile.html', title='My Profile', user=user, score=score)
+
+    return view_cache.cached('profile', user_id, {f'user:{user_id}'}, render_profile)
 
 
 @app.route('/get_employee_goals/<int:employee_id>')
+@replica_reads
 def get_employee_goals(employee_id):
-    if 'user_id' not in session:
+    if g.identity is None:
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
     
-    manager = User.query.get(session['user_id'])
-    if manager.role != 'Manager':
+    if g.identity.role != 'Manager':
         return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
     employee = User.query.get_or_404(employee_id)
-    if employee.manager_id != manager.id:
-        return jsonify({'success': False, 'message': 'Not a direct report'}), 403
+    if not manages(g.identity.id, employee.id):
+        return jsonify({'success': False, 'message': 'Not in your organization'}), 403
         
-    goals = [{
-        'id': goal.id,
-        'title': goal.title,
-        'progress': goal.get_progress(),
-        'feedback': goal.manager_feedback or ''
-    } for goal in employee.goals]
-    
-    return jsonify({'success': True, 'goals': goals, 'employee_name': employee.full_name})
+    def build_payload():
+        goals = [{
+            'id': goal.id,
+            'title': goal.title,
+            'progress': goal.get_progress(),
+            'feedback': goal.manager_feedback or ''
+        } for goal in employee.goals]
+        return {'success': True, 'goals': goals, 'employee_name': employee.full_name}
+
+    # Unchanged goal lists are answered with 304 before anything is loaded.
+    # The cached body is keyed by the ETag, so a worker whose cache missed
+    # another worker's write can't send the old body under the new tag.
+    etag = employee_goals_etag(employee)
+    return conditional_response(
+        etag,
+        lambda: jsonify(view_cache.cached('employee_goals', f'{employee.id}:{etag}',
+                                          {f'user:{employee.id}'}, build_payload))
+    )
 
 
 # --- NEW ROUTE TO FETCH GOAL HISTORY ---
 @app.route('/get_goal_history/<int:goal_id>')
+@replica_reads
 def get_goal_history(goal_id):
-    if 'user_id' not in session:
+    if g.identity is None:
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
 
-    user = User.query.get(session['user_id'])
-    goal = Goal.query.get_or_404(goal_id)
+    identity = g.identity
+    goal, _, in_org = load_goal_with_manager(goal_id, identity.id)
 
-    # Check if the user is the employee OR the employee's manager
+    # Check if the user is the employee OR a manager above them
     is_authorized = False
-    if goal.employee.id == user.id:
+    if goal.user_id == identity.id:
         is_authorized = True
-    if user.role == 'Manager' and goal.employee.manager_id == user.id:
+    if identity.role == 'Manager' and in_org:
         is_authorized = True
 
     if not is_authorized:
         return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
-    updates = []
-    # Fetch updates and order them by newest first
-    for update in goal.updates.order_by(ProgressUpdate.timestamp.desc()).all():
-        updates.append({
-            'value': update.update_value,
-            'comment': update.comment,
-            'proof': update.proof_url,
-            'author': update.author.full_name,
-            'timestamp': update.timestamp.strftime('%d-%b-%Y %I:%M %p')
-        })
+    # Keyset pagination: ?cursor=<next_cursor of the previous page>&limit=N
+    cursor = None
+    if request.args.get('cursor'):
+        try:
+            cursor = decode_cursor(request.args['cursor'])
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    def build_response():
+        # ?format=ndjson streams the whole (remaining) history, one update per
+        # line, so memory stays flat however long the audit trail is
+        if request.args.get('format') == 'ndjson':
+            goal_title = goal.title
+
+            def generate():
+                yield json.dumps({'success': True, 'goal_title': goal_title}) + '\n'
+                for entry in iter_history(goal_id, cursor):
+                    yield json.dumps(entry) + '\n'
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        limit = request.args.get('limit', app.config['HISTORY_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['HISTORY_MAX_PAGE_SIZE']))
+        updates, next_cursor = history_page(goal_id, cursor, limit)
+
+        return jsonify({'success': True, 'history': updates, 'goal_title': goal.title, 'next_cursor': next_cursor})
+
+    # Reopening the modal on an unchanged goal gets a 304 without running the history query
+    return conditional_response(goal_history_etag(goal), build_response)
+
+
+@app.route('/team_analytics')
+@replica_reads
+def team_analytics():
+    """
+    Team score trend for a manager's direct reports: one bucket per day (or
+    ?bucket=week) over the last ?days=365 days, plus the current velocity.
+    Administrators pass ?manager_id=.
+    """
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    if g.identity.role == 'Manager':
+        manager_id = g.identity.id
+    elif g.identity.role == 'Administrator':
+        manager_id = request.args.get('manager_id', type=int)
+        if manager_id is None:
+            return jsonify({'success': False, 'message': 'manager_id is required'}), 400
+    else:
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+
+    days = max(1, min(request.args.get('days', 365, type=int), app.config['ANALYTICS_MAX_DAYS']))
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ('day', 'week'):
+        return jsonify({'success': False, 'message': 'bucket must be day or week'}), 400
+
+    def build_payload():
+        return {'success': True, 'manager_id': manager_id, 'bucket': bucket,
+                **team_trend(manager_id, days, bucket)}
+
+    return jsonify(view_cache.cached(
+        'team_analytics', f'{manager_id}:{days}:{bucket}', {f'team:{manager_id}'}, build_payload
+    ))
+
+
+@app.route('/org_goals')
+@replica_reads
+def org_goals():
+    """
+    Goals of everyone below a manager, at any depth (?max_depth=1 for direct
+    reports only), in goal id order. Page with ?after=<next_after of the
+    previous page>&limit=N. Administrators pass ?manager_id=.
+    """
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    if g.identity.role == 'Manager':
+        manager_id = g.identity.id
+    elif g.identity.role == 'Administrator':
+        manager_id = request.args.get('manager_id', type=int)
+        if manager_id is None:
+            return jsonify({'success': False, 'message': 'manager_id is required'}), 400
+    else:
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+
+    limit = request.args.get('limit', app.config['ORG_GOALS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['ORG_GOALS_MAX_PAGE_SIZE']))
+    query = org_goals_query(manager_id, request.args.get('max_depth', type=int))
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.filter(Goal.id > after)
+    rows = query.order_by(Goal.id).limit(limit + 1).all()
+
+    goals = [{
+        'id': goal.id,
+        'title': goal.title,
+        'owner_id': goal.user_id,
+        'owner_name': owner_name,
+        'depth': depth,
+        'progress': goal.get_progress(),
+        'status': goal.status
+    } for goal, owner_name, depth in rows[:limit]]
+    next_after = goals[-1]['id'] if len(rows) > limit else None
+    return jsonify({'success': True, 'manager_id': manager_id, 'goals': goals, 'next_after': next_after})
+
+
+@app.route('/export/<kind>.csv')
+@replica_reads
+def export_csv(kind):
+    """
+    Streams all goals or progress updates as CSV for administrators.
+    Optional filters: ?manager_id= (reporting subtree) and ?start=/&end=
+    (YYYY-MM-DD, progress updates only).
+    """
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    if g.identity.role != 'Administrator':
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+    # Admin-only; loaded on first use (see app/startup.py)
+    from app.export import COLUMNS as EXPORT_COLUMNS, iter_csv, parse_date
+    if kind not in EXPORT_COLUMNS:
+        abort(404)
+
+    try:
+        start = parse_date(request.args.get('start'))
+        end = parse_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+    manager_id = request.args.get('manager_id', type=int)
+
+    filename = f"{kind}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.csv"
+    return Response(
+        stream_with_context(iter_csv(kind, manager_id, start, end)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 
-    return jsonify({'success': True, 'history': updates, 'goal_title': goal.title})
+@app.route('/search')
+@replica_reads
+def search_goals():
+    """
+    Ranked full-text search over goals and progress update comments the
+    caller can see: ?q=<words>&limit=20.
+    """
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': 'A search query is required.'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), app.config['SEARCH_MAX_RESULTS']))
+
+    return jsonify({'success': True, 'query': query, **search(g.identity, query, limit)})
+
+
+@app.route('/leaderboard')
+def leaderboard():
+    """
+    Ranked performance scores: ?scope=global (default), league (&league=,
+    defaults to the caller's) or team (&manager_id=, defaults to the caller's
+    own team). Paged with ?limit=10&offset=0; 'me' is the caller's own rank.
+    """
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    scope = request.args.get('scope', 'global')
+    key = None
+    if scope == 'league':
+        key = request.args.get('league', g.identity.league)
+    elif scope == 'team':
+        own_team = g.identity.id if g.identity.role == 'Manager' else g.identity.manager_id
+        key = request.args.get('manager_id', own_team, type=int)
+        if key is None:
+            return jsonify({'success': False, 'message': 'manager_id is required'}), 400
+        # Managers see their own team and their peers'; employees their own team
+        if g.identity.role != 'Administrator' and key not in (g.identity.id, g.identity.manager_id):
+            return jsonify({'success': False, 'message': 'Permission denied'}), 403
+    elif scope != 'global':
+        return jsonify({'success': False, 'message': 'scope must be global, league or team'}), 400
+
+    limit = max(1, min(request.args.get('limit', 10, type=int), app.config['LEADERBOARD_MAX_LIMIT']))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    standings = leaderboards.standings(scope, key, limit, offset, g.identity.id)
+    return jsonify({'success': True, 'scope': scope, 'key': key, **standings})
+
+
+@app.route('/events')
+def events():
+    """
+    Server-sent events for a manager's org: 'progress' and 'feedback'
+    changes to the goals of anyone below them as they are committed, and
+    'resync' when the client should reload. Administrators pass ?manager_id=.
+    """
+    if not app.config['EVENTS_ENABLED']:
+        abort(404)
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    if g.identity.role == 'Manager':
+        manager_id = g.identity.id
+    elif g.identity.role == 'Administrator':
+        manager_id = request.args.get('manager_id', type=int)
+        if manager_id is None:
+            return jsonify({'success': False, 'message': 'manager_id is required'}), 400
+    else:
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+
+    if event_broker.is_full():
+        return jsonify({'success': False, 'message': 'Too many live connections'}), 503, \
+            {'Retry-After': str(event_broker.keepalive)}
+
+    # Not wrapped in stream_with_context: the stream holds no app context or
+    # database session while it waits
+    resume = 'Last-Event-ID' in request.headers
+    stream = event_broker.stream(team_channel(manager_id), resume)
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/cache_stats')
+def cache_stats():
+    if g.identity is None:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    if g.identity.role != 'Administrator':
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
+    return jsonify({'success': True, 'cache': view_cache.metrics()})
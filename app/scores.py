@@ -0,0 +1,242 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, update, insert, delete, case, cast, func, Integer
+from app import app, db
+from app.models import User, Goal, UserScore, TeamScore, score_totals_query
+from app.analytics import record_weighted_deltas
+from app.leaderboard import leaderboards
+
+# Score store maintenance.
+#
+# UserScore keeps (total_weight, weighted_progress, performance_score) per user;
+# profiles, leagues, leaderboards and organization rollups read it.
+# TeamScore keeps the same sums per manager over their direct reports' goals
+# and only feeds the trend reconstruction in analytics.team_trend().
+# Every flush that creates, changes or deletes a Goal (or moves a user to
+# another manager) is turned into per-user deltas and applied with a couple of
+# UPDATE statements, so reading a score never has to touch the Goal table.
+# `flask rebuild-scores` recomputes everything from scratch to repair drift.
+
+# Guards against float residue in the running sums (e.g. 74.99999999 -> 74).
+_EPSILON = 1e-9
+
+
+def goal_contribution(current_value, target_value, weight):
+    """(weighted progress, weight) a goal adds to its owner's totals."""
+    if weight is None:
+        return 0.0, 0
+    if target_value == 0:
+        progress = 100
+    else:
+        progress = min(((current_value or 0) / target_value) * 100, 100)
+    return progress * weight, weight
+
+
+def _old_value(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.attrs[key].value
+
+
+def _old_contribution(goal):
+    state = inspect(goal)
+    owner_id = _old_value(state, 'user_id')
+    weighted, weight = goal_contribution(
+        _old_value(state, 'current_value'),
+        _old_value(state, 'target_value'),
+        _old_value(state, 'weight')
+    )
+    return owner_id, weighted, weight
+
+
+def _new_contribution(goal):
+    weighted, weight = goal_contribution(goal.current_value, goal.target_value, goal.weight)
+    return goal.user_id, weighted, weight
+
+
+def _score_column(weighted_column, weight_column):
+    return case(
+        (weight_column > 0, cast(weighted_column / weight_column + _EPSILON, Integer)),
+        else_=0
+    )
+
+
+def _apply(connection, model, key_column, deltas):
+    """Adds {key: [weighted, weight]} deltas to a score table, creating rows as needed."""
+    table = model.__table__
+    if model is UserScore:
+        score_column = table.c.performance_score
+    else:
+        score_column = table.c.avg_progress
+
+    for key, (weighted, weight) in deltas.items():
+        if key is None:
+            continue
+        result = connection.execute(
+            update(table)
+            .where(table.c[key_column] == key)
+            .values(
+                total_weight=table.c.total_weight + weight,
+                weighted_progress=table.c.weighted_progress + weighted
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(
+                {key_column: key, 'total_weight': weight,
+                 'weighted_progress': weighted, score_column.name: 0}
+            ))
+
+    touched = [key for key in deltas if key is not None]
+    if touched:
+        connection.execute(
+            update(table)
+            .where(table.c[key_column].in_(touched))
+            .values({score_column.name: _score_column(table.c.weighted_progress, table.c.total_weight)})
+        )
+
+
+def apply_score_deltas(connection, user_deltas, moved_users=()):
+    """
+    Applies per-user deltas to UserScore and the matching manager rollups in
+    TeamScore. `moved_users` is a list of (user_id, old_manager_id,
+    new_manager_id) for users whose reporting line changed.
+    """
+    team_deltas = defaultdict(lambda: [0.0, 0])
+
+    user_ids = [user_id for user_id in user_deltas if user_id is not None]
+    if user_ids:
+        managers = dict(connection.execute(
+            select(User.id, User.manager_id).where(User.id.in_(user_ids))
+        ).all())
+        for user_id in user_ids:
+            manager_id = managers.get(user_id)
+            if manager_id is not None:
+                team_deltas[manager_id][0] += user_deltas[user_id][0]
+                team_deltas[manager_id][1] += user_deltas[user_id][1]
+
+    # Applied before the user deltas so the moved totals are the pre-flush ones.
+    for user_id, old_manager_id, new_manager_id in moved_users:
+        current = connection.execute(
+            select(UserScore.weighted_progress, UserScore.total_weight)
+            .where(UserScore.user_id == user_id)
+        ).first()
+        if current is None:
+            continue
+        if old_manager_id is not None:
+            team_deltas[old_manager_id][0] -= current[0]
+            team_deltas[old_manager_id][1] -= current[1]
+        if new_manager_id is not None:
+            team_deltas[new_manager_id][0] += current[0]
+            team_deltas[new_manager_id][1] += current[1]
+
+    _apply(connection, UserScore, 'user_id', user_deltas)
+    _apply(connection, TeamScore, 'manager_id', team_deltas)
+    # Same deltas, bucketed by day for the trend charts
+    record_weighted_deltas(connection, user_deltas)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _remember_reporting_lines(session, flush_context, instances):
+    # Relationship assignments (user.manager = ...) only set manager_id during
+    # the flush without recording the previous value, so read it beforehand.
+    changed = {
+        obj.id: obj for obj in session.dirty
+        if isinstance(obj, User) and obj.id is not None and (
+            inspect(obj).attrs.manager_id.history.has_changes()
+            or inspect(obj).attrs.manager.history.has_changes()
+        )
+    }
+    if changed:
+        rows = session.connection().execute(
+            select(User.id, User.manager_id).where(User.id.in_(changed))
+        ).all()
+        previous = session.info.setdefault('previous_managers', {})
+        for user_id, manager_id in rows:
+            previous[changed[user_id]] = manager_id
+
+
+@event.listens_for(db.session, 'after_flush')
+def _track_goal_changes(session, flush_context):
+    user_deltas = defaultdict(lambda: [0.0, 0])
+    moved_users = []
+
+    def add(owner_id, weighted, weight, sign):
+        if owner_id is not None and (weighted or weight):
+            user_deltas[owner_id][0] += sign * weighted
+            user_deltas[owner_id][1] += sign * weight
+
+    for obj in session.new:
+        if isinstance(obj, Goal):
+            add(*_new_contribution(obj), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Goal) and session.is_modified(obj, include_collections=False):
+            add(*_old_contribution(obj), -1)
+            add(*_new_contribution(obj), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Goal):
+            add(*_old_contribution(obj), -1)
+
+    for user, old_manager_id in session.info.pop('previous_managers', {}).items():
+        if old_manager_id != user.manager_id:
+            moved_users.append((user.id, old_manager_id, user.manager_id))
+
+    # Edits that don't affect progress or weight (titles, feedback, ...) cancel out
+    user_deltas = {
+        user_id: delta for user_id, delta in user_deltas.items()
+        if delta[1] or abs(delta[0]) > _EPSILON
+    }
+    if user_deltas or moved_users:
+        apply_score_deltas(session.connection(), user_deltas, moved_users)
+
+
+# --- FULL REBUILD ---
+
+def rebuild_scores():
+    """Recomputes UserScore and TeamScore from the Goal table. Returns row counts."""
+    db.session.execute(delete(TeamScore))
+    db.session.execute(delete(UserScore))
+
+    totals = score_totals_query().filter(Goal.user_id.isnot(None)).all()
+    if totals:
+        db.session.execute(insert(UserScore), [{
+            'user_id': user_id,
+            'total_weight': total_weight or 0,
+            'weighted_progress': weighted or 0.0,
+            'performance_score': 0
+        } for user_id, weighted, total_weight in totals])
+
+    team_totals = db.session.query(
+        User.manager_id,
+        func.sum(UserScore.weighted_progress),
+        func.sum(UserScore.total_weight)
+    ).join(User, User.id == UserScore.user_id) \
+        .filter(User.manager_id.isnot(None)) \
+        .group_by(User.manager_id).all()
+    if team_totals:
+        db.session.execute(insert(TeamScore), [{
+            'manager_id': manager_id,
+            'total_weight': total_weight or 0,
+            'weighted_progress': weighted or 0.0,
+            'avg_progress': 0
+        } for manager_id, weighted, total_weight in team_totals])
+
+    user_table = UserScore.__table__
+    team_table = TeamScore.__table__
+    db.session.execute(update(user_table).values(
+        performance_score=_score_column(user_table.c.weighted_progress, user_table.c.total_weight)))
+    db.session.execute(update(team_table).values(
+        avg_progress=_score_column(team_table.c.weighted_progress, team_table.c.total_weight)))
+    db.session.commit()
+    leaderboards.reset()
+    return len(totals), len(team_totals)
+
+
+@app.cli.command('rebuild-scores')
+def rebuild_scores_command():
+    """Rebuild the cached user and team scores from the goals table."""
+    users, teams = rebuild_scores()
+    print(f"Rebuilt scores for {users} users and {teams} teams.")
@@ -0,0 +1,303 @@
+import html
+import re
+from sqlalchemy import event, select, text, or_, and_, DateTime
+from app import db
+from app.models import User, Goal, ProgressUpdate, ProgressUpdateArchive
+from app.hierarchy import org_member_ids
+
+# Full-text search over goals (title, description, manager feedback) and
+# progress update comments.
+#
+# On SQLite the text lives in external-content FTS5 tables (goal_fts,
+# progress_update_fts and progress_update_archive_fts) which triggers on the
+# content tables keep in sync; queries are ranked with bm25. They are created
+# by create_all() and by the migrations. Other engines fall back to
+# (unranked) LIKE matching. Comments moved to the archive (app/archive.py)
+# leave the hot index and enter the archive one, so they stay searchable.
+#
+# Results are scoped by the caller: employees see their own goals, managers
+# their own and everyone's below them, administrators everything.
+
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS goal_fts USING fts5("
+    "title, description, manager_feedback, content='goal', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS progress_update_fts USING fts5("
+    "comment, content='progress_update', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS progress_update_archive_fts USING fts5("
+    "comment, content='progress_update_archive', content_rowid='id', tokenize='porter unicode61')",
+]
+
+SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS goal_fts_ai AFTER INSERT ON goal BEGIN "
+    "INSERT INTO goal_fts(rowid, title, description, manager_feedback) "
+    "VALUES (new.id, new.title, new.description, new.manager_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS goal_fts_ad AFTER DELETE ON goal BEGIN "
+    "INSERT INTO goal_fts(goal_fts, rowid, title, description, manager_feedback) "
+    "VALUES ('delete', old.id, old.title, old.description, old.manager_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS goal_fts_au AFTER UPDATE OF title, description, manager_feedback "
+    "ON goal BEGIN "
+    "INSERT INTO goal_fts(goal_fts, rowid, title, description, manager_feedback) "
+    "VALUES ('delete', old.id, old.title, old.description, old.manager_feedback); "
+    "INSERT INTO goal_fts(rowid, title, description, manager_feedback) "
+    "VALUES (new.id, new.title, new.description, new.manager_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_fts_ai AFTER INSERT ON progress_update BEGIN "
+    "INSERT INTO progress_update_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_fts_ad AFTER DELETE ON progress_update BEGIN "
+    "INSERT INTO progress_update_fts(progress_update_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_fts_au AFTER UPDATE OF comment ON progress_update BEGIN "
+    "INSERT INTO progress_update_fts(progress_update_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); "
+    "INSERT INTO progress_update_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_archive_fts_ai AFTER INSERT ON progress_update_archive BEGIN "
+    "INSERT INTO progress_update_archive_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_archive_fts_ad AFTER DELETE ON progress_update_archive BEGIN "
+    "INSERT INTO progress_update_archive_fts(progress_update_archive_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_archive_fts_au AFTER UPDATE OF comment "
+    "ON progress_update_archive BEGIN "
+    "INSERT INTO progress_update_archive_fts(progress_update_archive_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); "
+    "INSERT INTO progress_update_archive_fts(rowid, comment) VALUES (new.id, new.comment); END",
+]
+
+SEARCH_TABLES = ('goal_fts', 'progress_update_fts', 'progress_update_archive_fts')
+
+# (index, content table, archived) searched for update comments
+UPDATE_INDEXES = (('progress_update_fts', 'progress_update', False),
+                  ('progress_update_archive_fts', 'progress_update_archive', True))
+
+# Unlikely to appear in user text; replaced by <mark> after HTML escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+MAX_TERMS = 8
+
+
+# --- INDEX MAINTENANCE ---
+
+def has_search_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'goal_fts'"
+    ).first() is not None
+
+
+def create_search_triggers(connection):
+    for statement in SEARCH_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_triggers(connection):
+    # Every trigger feeding an FTS table is named after it (goal_fts_ai, ...)
+    prefixes = tuple(f'{table}_' for table in SEARCH_TABLES)
+    names = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars()
+    for name in [name for name in names if name.startswith(prefixes)]:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def rebuild_search_index(connection):
+    """Re-reads every goal and comment into the FTS tables (after bulk loads)."""
+    for table in SEARCH_TABLES:
+        connection.exec_driver_sql(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(metadata, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for statement in SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        create_search_triggers(connection)
+        rebuild_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_index(metadata, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        drop_search_triggers(connection)
+        for table in SEARCH_TABLES:
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS {table}')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Passed to Flask-Migrate (app/startup.py). The FTS tables (and their
+    # shadow tables) aren't models; keep autogenerate from proposing to drop them
+    if type_ == 'table' and reflected and compare_to is None:
+        return not name.startswith(SEARCH_TABLES)
+    return True
+
+
+# --- QUERIES ---
+
+_index_available = {}
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _match_expression(terms):
+    # Every term must appear; the last one also matches as a prefix so
+    # results show up while the user is still typing
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _scope_sql(identity):
+    if identity.role == 'Administrator':
+        return ''
+    if identity.role == 'Manager':
+        return 'AND g.user_id IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = :me)'
+    return 'AND g.user_id = :me'
+
+
+def _snippet(value):
+    escaped = html.escape(value or '')
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _fts_search(identity, terms, limit):
+    params = {'match': _match_expression(terms), 'me': identity.id, 'limit': limit,
+              'start': _MARK_START, 'end': _MARK_END}
+    scope = _scope_sql(identity)
+
+    goal_rows = db.session.execute(text(f"""
+        SELECT g.id, g.title, g.user_id, owner.full_name AS owner_name,
+               snippet(goal_fts, -1, :start, :end, '...', 12) AS snippet
+        FROM goal_fts
+        JOIN goal g ON g.id = goal_fts.rowid
+        LEFT JOIN "user" owner ON owner.id = g.user_id
+        WHERE goal_fts MATCH :match {scope}
+        ORDER BY bm25(goal_fts, 10.0, 2.0, 2.0)
+        LIMIT :limit
+    """), params).all()
+
+    # Best matches of the hot and archived comments, merged by bm25 score
+    update_rows = []
+    for index, table, archived in UPDATE_INDEXES:
+        update_rows += db.session.execute(text(f"""
+            SELECT pu.id, pu.goal_id, g.title AS goal_title, author.full_name AS author_name,
+                   pu.timestamp, {int(archived)} AS archived,
+                   snippet({index}, 0, :start, :end, '...', 16) AS snippet,
+                   bm25({index}) AS rank
+            FROM {index}
+            JOIN {table} pu ON pu.id = {index}.rowid
+            JOIN goal g ON g.id = pu.goal_id
+            LEFT JOIN "user" author ON author.id = pu.user_id
+            WHERE {index} MATCH :match {scope}
+            ORDER BY rank
+            LIMIT :limit
+        """).columns(timestamp=DateTime), params).all()
+    update_rows = sorted(update_rows, key=lambda row: row.rank)[:limit]
+    return goal_rows, update_rows
+
+
+def _like_scope(query, identity):
+    """Restricts a query joined to Goal to what identity may see."""
+    if identity.role == 'Manager':
+        return query.filter(Goal.user_id.in_(org_member_ids(identity.id, include_self=True)))
+    if identity.role != 'Administrator':
+        return query.filter(Goal.user_id == identity.id)
+    return query
+
+
+def _like_snippet(value, terms, width=80):
+    value = value or ''
+    lowered = value.lower()
+    position = min((lowered.find(term) for term in terms if term in lowered), default=0)
+    start = max(0, position - width // 4)
+    excerpt = value[start:start + width]
+    # Matches are found on the raw text (longest term first) and the text is
+    # escaped piece by piece, so terms never match inside markup or entities
+    pattern = '|'.join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True))
+    pieces = []
+    position = 0
+    for match in re.finditer(pattern, excerpt, flags=re.IGNORECASE) if terms else ():
+        pieces.append(html.escape(excerpt[position:match.start()]))
+        pieces.append('<mark>' + html.escape(match.group()) + '</mark>')
+        position = match.end()
+    pieces.append(html.escape(excerpt[position:]))
+    return ('...' if start else '') + ''.join(pieces) + ('...' if start + width < len(value) else '')
+
+
+def _like_search(identity, terms, limit):
+    def contains(column, term):
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return column.ilike(f'%{escaped}%', escape='\\')
+
+    owner = db.aliased(User)
+    goal_query = db.session.query(Goal.id, Goal.title, Goal.user_id, owner.full_name.label('owner_name'),
+                                  Goal.description, Goal.manager_feedback) \
+        .outerjoin(owner, owner.id == Goal.user_id) \
+        .filter(and_(*[
+            or_(contains(Goal.title, term), contains(Goal.description, term),
+                contains(Goal.manager_feedback, term))
+            for term in terms
+        ]))
+    goal_query = _like_scope(goal_query, identity)
+    goal_rows = [
+        {'id': row.id, 'title': row.title, 'user_id': row.user_id, 'owner_name': row.owner_name,
+         'snippet': _like_snippet(' '.join(filter(None, (row.title, row.description, row.manager_feedback))), terms)}
+        for row in goal_query.order_by(Goal.id.desc()).limit(limit)
+    ]
+
+    # Newest hot and archived comments; both tables share one id sequence
+    author = db.aliased(User)
+    update_rows = []
+    for model in (ProgressUpdate, ProgressUpdateArchive):
+        update_query = db.session.query(
+            model.id, model.goal_id, Goal.title.label('goal_title'),
+            author.full_name.label('author_name'), model.timestamp, model.comment
+        ).join(Goal, Goal.id == model.goal_id) \
+            .outerjoin(author, author.id == model.user_id) \
+            .filter(and_(*[contains(model.comment, term) for term in terms]))
+        update_query = _like_scope(update_query, identity)
+        update_rows += [
+            {'id': row.id, 'goal_id': row.goal_id, 'goal_title': row.goal_title,
+             'author_name': row.author_name, 'timestamp': row.timestamp,
+             'archived': model is ProgressUpdateArchive, 'snippet': _like_snippet(row.comment, terms)}
+            for row in update_query.order_by(model.id.desc()).limit(limit)
+        ]
+    update_rows = sorted(update_rows, key=lambda row: row['id'], reverse=True)[:limit]
+    return goal_rows, update_rows
+
+
+def _search_index_available():
+    # Checked once per engine (the replica may be the one serving reads)
+    engine = db.session.get_bind(clause=select(Goal.id))
+    if engine not in _index_available:
+        with engine.connect() as connection:
+            _index_available[engine] = has_search_index(connection)
+    return _index_available[engine]
+
+
+def search(identity, query, limit=20):
+    """
+    Goals and progress updates matching every word of `query` that the
+    identity may see, best matches first. Returns a JSON-ready dict.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return {'goals': [], 'updates': [], 'engine': None}
+
+    if _search_index_available():
+        engine = 'fts5'
+        goal_rows, update_rows = _fts_search(identity, terms, limit)
+        goal_rows = [dict(row._mapping, snippet=_snippet(row.snippet)) for row in goal_rows]
+        update_rows = [dict(row._mapping, snippet=_snippet(row.snippet)) for row in update_rows]
+    else:
+        engine = 'like'
+        goal_rows, update_rows = _like_search(identity, terms, limit)
+
+    return {
+        'goals': [{
+            'id': row['id'], 'title': row['title'], 'owner': row['owner_name'], 'snippet': row['snippet']
+        } for row in goal_rows],
+        'updates': [{
+            'id': row['id'], 'goal_id': row['goal_id'], 'goal_title': row['goal_title'],
+            'author': row['author_name'], 'snippet': row['snippet'], 'archived': bool(row['archived']),
+            'timestamp': row['timestamp'].strftime('%d-%b-%Y %I:%M %p') if row['timestamp'] else None
+        } for row in update_rows],
+        'engine': engine,
+    }
@@ -0,0 +1,110 @@
+import importlib
+import os
+import time
+from flask.cli import AppGroup
+
+# Startup cost.
+#
+# Importing the app package builds the app and loads what requests and
+# session hooks need. Everything else loads on first use:
+#
+# - CLI commands used only from the command line (`flask db`, data
+#   generation, archiving, exports) are listed in LAZY_COMMANDS and imported
+#   when the command is looked up. Flask-Migrate (and with it Alembic) is
+#   only set up for `flask db ...`.
+# - The CSV export view imports app/export.py on its first request.
+#
+# get_app() returns the app to WSGI servers (run.py). With STARTUP_PRELOAD
+# it also warms the app before serving: every template is compiled, the
+# mappers are configured, the leaderboards are built, each engine opens (and
+# returns) one connection and the reference password hash is computed. Under
+# gunicorn --preload (see gunicorn.conf.py) this happens once in the master
+# and the forked workers inherit the result. Pooled connections are dropped
+# before and after the fork, so no worker shares a database connection.
+
+# command name -> 'module' that registers it on import, or 'module:function'
+LAZY_COMMANDS = {
+    'db': 'app.startup:init_migrate',
+    'generate-data': 'app.datagen',
+    'archive-updates': 'app.archive',
+    'export': 'app.export',
+}
+
+
+class LazyAppGroup(AppGroup):
+    """app.cli that imports a command's module the first time the command is looked up."""
+
+    def __init__(self, lazy_commands, **kwargs):
+        super().__init__(**kwargs)
+        self.lazy_commands = lazy_commands
+
+    def get_command(self, ctx, name):
+        target = self.lazy_commands.get(name)
+        if target is not None and name not in self.commands:
+            module, _, function = target.partition(':')
+            module = importlib.import_module(module)
+            if function:
+                getattr(module, function)()
+        return super().get_command(ctx, name)
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+
+def init_migrate():
+    """Sets up Flask-Migrate; registers the `flask db` commands."""
+    from flask_migrate import Migrate
+    from app import app, db
+    from app.search import include_object
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, include_object=include_object)
+
+
+def _dispose_engines(app, db, close=True):
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def preload(app, db):
+    """
+    Warms the app up before it serves requests. Returns {step: milliseconds}.
+    Safe to call before forking workers.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.orm import configure_mappers
+    from app.passwords import password_hasher
+    from app.leaderboard import leaderboards
+
+    timings = {}
+
+    def step(name, function):
+        started = time.perf_counter()
+        function()
+        timings[name] = (time.perf_counter() - started) * 1000
+
+    def compile_templates():
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(name)
+
+    def build_leaderboards():
+        with app.app_context():
+            leaderboards.build()
+            db.session.remove()
+
+    def connect():
+        with app.app_context():
+            for engine in db.engines.values():
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+        # Workers open their own connections
+        _dispose_engines(app, db)
+
+    step('templates', compile_templates)
+    step('mappers', configure_mappers)
+    step('leaderboards', build_leaderboards)
+    step('connections', connect)
+    step('password_hash', password_hasher.preload)
+    # Connections a forked child inherits belong to the parent
+    os.register_at_fork(after_in_child=lambda: _dispose_engines(app, db, close=False))
+    return timings
@@ -0,0 +1,102 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+from app.transactions import commit_handler, on_commit
+
+# Background league recomputation.
+#
+# Write routes call schedule_league_update(user_id) before committing. In 'sync'
+# mode (tests) the league is recomputed right away inside the same
+# transaction. In 'async' mode the user id is queued and handed to a small
+# thread pool once the transaction commits. Requests for a user that is
+# already waiting in the queue are coalesced, so a burst of updates triggers
+# a single recompute.
+
+
+class LeagueRecomputer:
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.futures = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['league_recomputer'] = self
+        app.config.setdefault('LEAGUE_RECOMPUTE_MODE', 'async')
+        app.config.setdefault('LEAGUE_RECOMPUTE_WORKERS', 2)
+
+    @property
+    def is_async(self):
+        return self.app.config['LEAGUE_RECOMPUTE_MODE'] == 'async'
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.app.config['LEAGUE_RECOMPUTE_WORKERS'],
+                thread_name_prefix='league-recompute'
+            )
+            atexit.register(self.shutdown)
+        return self.executor
+
+    def submit(self, user_ids):
+        with self.lock:
+            new_ids = [user_id for user_id in user_ids if user_id not in self.pending]
+            self.pending.update(new_ids)
+            for user_id in new_ids:
+                future = self._get_executor().submit(self._run, user_id)
+                self.futures.add(future)
+                future.add_done_callback(self.futures.discard)
+
+    def _run(self, user_id):
+        # Leave the pending set before reading, so an update committed while
+        # this job runs queues a fresh recompute instead of being lost.
+        with self.lock:
+            self.pending.discard(user_id)
+
+        from app.models import User
+        with self.app.app_context():
+            # Nobody waits on the future, so failures are logged here
+            try:
+                user = db.session.get(User, user_id)
+                if user is not None:
+                    user.update_league()
+                    db.session.commit()
+            except Exception:
+                self.app.logger.exception('League recompute for user %s failed', user_id)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    def wait(self, timeout=None):
+        """Blocks until every queued recompute has finished (for tests and benchmarks)."""
+        for future in list(self.futures):
+            future.result(timeout)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+league_recomputer = LeagueRecomputer()
+
+
+def schedule_league_update(user_id):
+    """Recomputes the user's league now (sync mode) or after the commit (async mode)."""
+    if league_recomputer.is_async:
+        on_commit(db.session, 'league_recompute', (user_id,))
+    else:
+        from app.models import User
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user.update_league()
+
+
+@commit_handler('league_recompute')
+def _submit_league_updates(user_ids):
+    league_recomputer.submit(user_ids)
@@ -0,0 +1,41 @@
+from sqlalchemy import event
+from app import db
+
+# Work deferred until the transaction commits.
+#
+# Session hooks that notice a change (cache tags to invalidate, users whose
+# league, identity or leaderboard entry is out of date, ...) call
+# on_commit(session, key, items). The items pile up in the session under that
+# key and are handed to the handler registered with @commit_handler(key) once
+# the transaction commits. A rollback discards everything pending, so no
+# handler ever sees changes that were never committed.
+
+_handlers = {}
+
+
+def commit_handler(key):
+    """Registers the function called with the items collected under key after a commit."""
+    def register(handler):
+        _handlers[key] = handler
+        return handler
+    return register
+
+
+def on_commit(session, key, items=()):
+    """
+    Queues items (ids, tags, ...) for the key's handler. With no items the
+    handler is still called once, for hooks that only care that something
+    was written.
+    """
+    session.info.setdefault('on_commit', {}).setdefault(key, set()).update(items)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _run_commit_handlers(session):
+    for key, items in session.info.pop('on_commit', {}).items():
+        _handlers[key](items)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_commit_handlers(session):
+    session.info.pop('on_commit', None)
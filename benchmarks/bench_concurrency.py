@@ -0,0 +1,148 @@
+"""
+Measures read/write throughput with many concurrent update_goal writers.
+
+Every writer and reader is a separate process (like gunicorn workers) with
+its own engine, logged in as a different employee. Writers post progress
+updates to their own goals in a loop; readers fetch goal histories. Each
+engine profile runs for --duration seconds against a fresh copy of the same
+generated database:
+
+    python -m benchmarks.bench_concurrency --writers 8 --readers 4 --duration 10
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from benchmarks.common import ROOT, make_parser, percentile, temp_database, seed
+
+
+def parse_args():
+    parser = make_parser(__doc__, depth=3, fanout=6, updates_per_goal=10)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per profile')
+    parser.add_argument('--profiles', default='default,production',
+                        help='comma separated DATABASE_PROFILE values to compare')
+    parser.add_argument('--no-begin-immediate', action='store_true',
+                        help='turn SQLITE_BEGIN_IMMEDIATE off for the production profile')
+    return parser.parse_args()
+
+
+def worker(kind, email, password, goal_ids, duration, environment, ready, start, results):
+    os.environ.update(environment)
+    sys.path.insert(0, ROOT)
+    import logging
+    from app import app
+
+    # Failed requests are counted, not logged with a traceback each
+    app.logger.setLevel(logging.CRITICAL)
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': password})
+
+    # Every process starts the clock together, once all of them are set up
+    ready.put(True)
+    start.wait()
+    deadline = time.time() + duration
+    ok = errors = 0
+    latencies = []
+    n = 0
+    while time.time() < deadline:
+        goal_id = goal_ids[n % len(goal_ids)]
+        n += 1
+        started = time.perf_counter()
+        if kind == 'write':
+            response = client.post(f'/update_goal/{goal_id}', data={
+                'progress': n % 100, 'status': 'In Progress', 'comment': f'Concurrent update {n}'
+            })
+        else:
+            response = client.get(f'/get_goal_history/{goal_id}')
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code == 200:
+            ok += 1
+        else:
+            errors += 1
+
+    from app.tasks import league_recomputer
+    league_recomputer.wait()
+    results.put((kind, ok, errors, latencies))
+
+
+def prepare(path, args):
+    app, db, summary = seed(path, args.depth, args.fanout, 3, args.updates_per_goal)
+    from app.models import User, Goal
+
+    with app.app_context():
+        employees = User.query.filter_by(role='Employee').order_by(User.id) \
+            .limit(args.writers + args.readers).all()
+        if len(employees) < args.writers + args.readers:
+            sys.exit('Not enough employees; raise --depth or --fanout')
+        accounts = [
+            (employee.email, [goal.id for goal in Goal.query.filter_by(user_id=employee.id)])
+            for employee in employees
+        ]
+        db.engine.dispose()
+    return accounts, summary['password']
+
+
+def run_profile(profile, base_path, accounts, password, args):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, f'{profile}.db')
+    shutil.copy(base_path, path)
+    environment = {
+        'DATABASE_URL': 'sqlite:///' + path,
+        'DATABASE_PROFILE': profile,
+        'SQLITE_BEGIN_IMMEDIATE': '0' if args.no_begin_immediate else '1',
+        'CACHE_BACKEND': 'none',
+        # Hash on the worker's own thread: a password pool's processes would
+        # keep the spawned worker from exiting
+        'PASSWORD_HASH_WORKERS': '0',
+    }
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    ready = context.Queue()
+    start = context.Event()
+    processes = []
+    for n, (email, goal_ids) in enumerate(accounts):
+        kind = 'write' if n < args.writers else 'read'
+        process = context.Process(
+            target=worker,
+            args=(kind, email, password, goal_ids, args.duration, environment, ready, start, results)
+        )
+        process.start()
+        processes.append(process)
+    for _ in processes:
+        ready.get()
+    start.set()
+
+    totals = {'write': [0, 0, []], 'read': [0, 0, []]}
+    for _ in processes:
+        kind, ok, errors, latencies = results.get()
+        totals[kind][0] += ok
+        totals[kind][1] += errors
+        totals[kind][2].extend(latencies)
+    for process in processes:
+        process.join()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    for kind, (ok, errors, latencies) in totals.items():
+        print(f'{profile:12} {kind:6} {ok / args.duration:9.1f} {errors:7d} '
+              f'{percentile(latencies, 50):9.2f} {percentile(latencies, 95):9.2f} '
+              f'{percentile(latencies, 99):9.2f}')
+
+
+def main():
+    args = parse_args()
+    base_path = temp_database('bench_concurrency.db')
+    accounts, password = prepare(base_path, args)
+
+    print(f'\n{args.writers} writers, {args.readers} readers, {args.duration:g}s per profile')
+    print(f'{"profile":12} {"kind":6} {"req/s":>9} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for profile in args.profiles.split(','):
+        run_profile(profile, base_path, accounts, password, args)
+
+
+if __name__ == '__main__':
+    main()
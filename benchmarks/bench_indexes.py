@@ -0,0 +1,90 @@
+"""
+Benchmarks the hot-path queries against a large seeded database with and
+without the foreign-key/composite indexes added in revision 8c41d2e9a7f3.
+
+Prints the query plan and timings of every query for both runs:
+
+    python -m benchmarks.bench_indexes --depth 4 --fanout 12 --updates-per-goal 10
+"""
+import statistics
+import time
+from benchmarks.common import make_parser, temp_database, seed
+
+INDEX_NAMES = [
+    'ix_user_manager_id',
+    'ix_goal_user_id_status',
+    'ix_progress_update_user_id',
+    'ix_progress_update_goal_id_timestamp',
+]
+
+
+def parse_args():
+    parser = make_parser(__doc__, depth=4, fanout=12, goals_per_user=5, updates_per_goal=10)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--repeat', type=int, default=50, help='runs per query')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    path = args.db or temp_database('bench_indexes.db')
+    app, db, _ = seed(path, args.depth, args.fanout, args.goals_per_user, args.updates_per_goal)
+    from app.models import User, Goal, ProgressUpdate
+    from app.aggregates import org_tree_cte
+
+    with app.app_context():
+        indexes = {
+            index.name: index
+            for table in db.metadata.tables.values()
+            for index in table.indexes if index.name in INDEX_NAMES
+        }
+
+        def compile_sql(query):
+            statement = getattr(query, 'statement', query)
+            return str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+
+        sample_manager = db.session.query(db.func.max(User.manager_id)).scalar()
+        sample_user = User.query.filter_by(manager_id=sample_manager).first().id
+        sample_goal = Goal.query.filter_by(user_id=sample_user).first().id
+        tree = org_tree_cte([sample_manager])
+        queries = {
+            'user goals by status': Goal.query.filter(Goal.user_id == sample_user).order_by(Goal.status.asc()),
+            'manager reports': User.query.filter(User.manager_id == sample_manager),
+            'team goals (dashboard)': Goal.query.join(User, Goal.user_id == User.id)
+                .filter(User.manager_id == sample_manager).order_by(Goal.user_id, Goal.status.asc()),
+            'goal history (newest first)': ProgressUpdate.query.filter(ProgressUpdate.goal_id == sample_goal)
+                .order_by(ProgressUpdate.timestamp.desc()),
+            'updates by author': db.session.query(db.func.count(ProgressUpdate.id))
+                .filter(ProgressUpdate.user_id == sample_user),
+            'subtree walk': db.select(db.func.count()).select_from(tree),
+        }
+        compiled = {name: compile_sql(query) for name, query in queries.items()}
+
+        def run(label):
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('ANALYZE')
+                print(f'\n=== {label} ===')
+                for name, sql in compiled.items():
+                    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).all()
+                    timings = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        connection.exec_driver_sql(sql).all()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    print(f'{name:30} median {statistics.median(timings):8.3f} ms   max {max(timings):8.3f} ms')
+                    for row in plan:
+                        print(f'    {row[-1]}')
+
+        with db.engine.begin() as connection:
+            for index in indexes.values():
+                index.drop(connection)
+        run('without indexes')
+
+        with db.engine.begin() as connection:
+            for index in indexes.values():
+                index.create(connection)
+        run('with indexes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Measures login throughput and how much a login burst slows other pages.
+
+The app runs in a threaded HTTP server in its own process. A burst of
+--login-clients threads post logins as fast as they can. Clients that get a
+503 back off for the Retry-After time. Meanwhile --dashboard-clients
+logged-in users load /dashboard. Each mode runs for --duration seconds:
+
+    python -m benchmarks.bench_login --login-clients 32 --duration 10
+
+Modes are PASSWORD_HASH_WORKERS values: 0 hashes on the request threads, N > 0
+on a pool of N processes.
+"""
+import http.cookiejar
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from benchmarks.common import ROOT, make_parser, percentile, temp_database, seed
+
+
+def parse_args():
+    parser = make_parser(__doc__)
+    parser.add_argument('--login-clients', type=int, default=32)
+    parser.add_argument('--dashboard-clients', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per mode')
+    parser.add_argument('--modes', default='0,2', help='comma separated PASSWORD_HASH_WORKERS values')
+    parser.add_argument('--max-pending', type=int, default=8, help='PASSWORD_HASH_MAX_PENDING')
+    parser.add_argument('--hash-method', default='scrypt', help='PASSWORD_HASH_METHOD')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(port, environment):
+    os.environ.update(environment)
+    sys.path.insert(0, ROOT)
+    import logging
+    import signal
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    # Stop serving on terminate() and shut the password pool down cleanly
+    signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=server.shutdown).start())
+    server.serve_forever()
+    # Before multiprocessing's exit hook starts waiting for the pool's workers
+    app.extensions['password_hasher'].shutdown()
+
+
+def prepare(path, args):
+    os.environ['PASSWORD_HASH_METHOD'] = args.hash_method
+    app, db, summary = seed(path, 3, 6, 3, 2)
+    from app.models import User
+
+    with app.app_context():
+        emails = [email for email, in db.session.query(User.email)
+                  .filter_by(role='Employee').order_by(User.id)
+                  .limit(args.login_clients + args.dashboard_clients)]
+        db.engine.dispose()
+    return emails, summary['password']
+
+
+def client():
+    return urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+        NoRedirect()
+    )
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def request(opener, url, data=None):
+    """(status, Retry-After) of one request; redirects are not followed."""
+    body = urllib.parse.urlencode(data).encode() if data else None
+    try:
+        with opener.open(url, body, timeout=60) as response:
+            response.read()
+            return response.status, None
+    except urllib.error.HTTPError as error:
+        error.read()
+        return error.code, error.headers.get('Retry-After')
+
+
+def login_loop(base, email, password, deadline, results):
+    ok = busy = failed = 0
+    latencies = []
+    while time.time() < deadline:
+        opener = client()
+        started = time.perf_counter()
+        status, retry_after = request(opener, f'{base}/login', {'email': email, 'password': password})
+        if status == 302:
+            ok += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+        elif status == 503:
+            busy += 1
+            time.sleep(min(float(retry_after or 1), max(0.0, deadline - time.time())))
+        else:
+            failed += 1
+    results.append(('login', ok, busy, failed, latencies))
+
+
+def dashboard_loop(base, email, password, deadline, results):
+    opener = client()
+    request(opener, f'{base}/login', {'email': email, 'password': password})
+    ok = failed = 0
+    latencies = []
+    while time.time() < deadline:
+        started = time.perf_counter()
+        status, _ = request(opener, f'{base}/dashboard')
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status == 200:
+            ok += 1
+        else:
+            failed += 1
+    results.append(('dashboard', ok, 0, failed, latencies))
+
+
+def wait_for(base):
+    for _ in range(600):
+        try:
+            request(client(), f'{base}/login')
+            return
+        except OSError:
+            time.sleep(0.1)
+    sys.exit('Server did not start')
+
+
+def run_mode(workers, base_path, emails, password, args):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench_login.db')
+    shutil.copy(base_path, path)
+    port = free_port()
+    environment = {
+        'DATABASE_URL': 'sqlite:///' + path,
+        'DATABASE_PROFILE': 'production',
+        'CACHE_BACKEND': 'none',
+        'PASSWORD_HASH_METHOD': args.hash_method,
+        'PASSWORD_HASH_WORKERS': str(workers),
+        'PASSWORD_HASH_MAX_PENDING': str(args.max_pending),
+    }
+    server = multiprocessing.get_context('spawn').Process(target=serve, args=(port, environment))
+    server.start()
+    base = f'http://127.0.0.1:{port}'
+    wait_for(base)
+
+    # Dashboard users sign in before the burst starts
+    deadline = time.time() + args.duration + 5
+    results = []
+    readers = [
+        threading.Thread(target=dashboard_loop, args=(base, email, password, deadline, results))
+        for email in emails[args.login_clients:]
+    ]
+    for thread in readers:
+        thread.start()
+    time.sleep(5)
+    logins = [
+        threading.Thread(target=login_loop, args=(base, email, password, deadline, results))
+        for email in emails[:args.login_clients]
+    ]
+    for thread in logins:
+        thread.start()
+    for thread in readers + logins:
+        thread.join()
+    server.terminate()
+    server.join()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    label = 'inline' if workers == 0 else f'pool x{workers}'
+    for kind in ('login', 'dashboard'):
+        rows = [row for row in results if row[0] == kind]
+        ok = sum(row[1] for row in rows)
+        busy = sum(row[2] for row in rows)
+        failed = sum(row[3] for row in rows)
+        latencies = [latency for row in rows for latency in row[4]]
+        # Dashboards ran 5s longer (warm-up before the burst)
+        seconds = args.duration + (5 if kind == 'dashboard' else 0)
+        print(f'{label:10} {kind:10} {ok / seconds:8.1f} {busy:6d} {failed:6d} '
+              f'{percentile(latencies, 50):9.1f} {percentile(latencies, 95):9.1f} '
+              f'{percentile(latencies, 99):9.1f}')
+
+
+def main():
+    args = parse_args()
+    base_path = temp_database('bench_login.db')
+    emails, password = prepare(base_path, args)
+    if len(emails) < args.login_clients + args.dashboard_clients:
+        sys.exit('Not enough employees for that many clients')
+
+    print(f'\n{args.login_clients} login clients, {args.dashboard_clients} dashboard clients, '
+          f'{args.duration:g}s per mode, {os.cpu_count()} CPUs')
+    print(f'{"mode":10} {"page":10} {"ok/s":>8} {"503":>6} {"failed":>6} '
+          f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for workers in args.modes.split(','):
+        run_mode(int(workers), base_path, emails, password, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmarks the main routes through Flask's test client against a synthetic
+database of configurable size.
+
+For every route it reports p50/p95/p99 latency, SQL queries per request and
+peak Python memory, and can save the results as JSON and compare them with an
+earlier run to catch regressions between commits. Routes are measured cold
+(the view cache cleared before every request, so the query counts show the
+real work) and warm (served from the cache), reported as `route` and
+`route:warm`:
+
+    python -m benchmarks.bench_routes --depth 4 --fanout 10 --output before.json
+    python -m benchmarks.bench_routes --depth 4 --fanout 10 --compare before.json
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from benchmarks.common import make_parser, percentile, temp_database, use_database, seed
+
+
+def parse_args():
+    parser = make_parser(__doc__, depth=3, fanout=10, goals_per_user=5, updates_per_goal=10)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--reuse-db', action='store_true',
+                        help='Benchmark an existing --db instead of generating data')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per route')
+    parser.add_argument('--routes', help='comma separated subset of routes to run')
+    parser.add_argument('--cache', choices=['cold', 'warm', 'both'], default='both',
+                        help='view cache state to measure (default both)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative p95 slowdown reported as a regression (default 0.2)')
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_scenarios(app, db, summary):
+    """
+    Returns {name: (client, request function)} for each benchmarked route,
+    using the sample accounts of the generated organization.
+    """
+    from app.models import User, Goal
+
+    password = summary['password']
+    with app.app_context():
+        admin = User.query.filter_by(role='Administrator').first()
+        # The deepest manager has employees (with goals) as direct reports
+        manager = User.query.filter(User.role == 'Manager').order_by(User.id.desc()).first()
+        employee = User.query.filter_by(manager_id=manager.id).first()
+        goal = Goal.query.filter_by(user_id=employee.id).first()
+        accounts = {'admin': admin.email, 'manager': manager.email, 'employee': employee.email}
+        employee_id, goal_id = employee.id, goal.id
+
+    def logged_in(role):
+        client = app.test_client()
+        response = client.post('/login', data={'email': accounts[role], 'password': password})
+        assert response.status_code == 302, f'login as {role} failed'
+        return client
+
+    def login(client):
+        # A fresh client per request so the session never short-circuits login
+        return app.test_client().post('/login', data={'email': accounts['employee'], 'password': password})
+
+    counter = {'value': 0}
+
+    def update_goal(client):
+        counter['value'] += 1
+        return client.post(f'/update_goal/{goal_id}', data={
+            'progress': counter['value'] % 100, 'status': 'In Progress',
+            'comment': f'Benchmark update {counter["value"]}'
+        })
+
+    return {
+        'login': (None, login),
+        'dashboard': (logged_in('manager'), lambda client: client.get('/dashboard')),
+        'organization': (logged_in('admin'), lambda client: client.get('/organization')),
+        'update_goal': (logged_in('employee'), update_goal),
+        'get_employee_goals': (logged_in('manager'),
+                               lambda client: client.get(f'/get_employee_goals/{employee_id}')),
+        'get_goal_history': (logged_in('employee'),
+                             lambda client: client.get(f'/get_goal_history/{goal_id}')),
+    }
+
+
+def run_scenario(app, client, request, args, query_counter, cold):
+    from app.cache import view_cache
+
+    def prepare():
+        if cold:
+            view_cache.clear()
+
+    for _ in range(args.warmup):
+        prepare()
+        request(client)
+
+    latencies = []
+    queries = []
+    for _ in range(args.requests):
+        prepare()
+        query_counter['value'] = 0
+        started = time.perf_counter()
+        response = request(client)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(query_counter['value'])
+        if response.status_code >= 400:
+            raise RuntimeError(f'unexpected status {response.status_code}')
+
+    # Memory is traced in a separate pass so tracemalloc doesn't skew latencies
+    tracemalloc.start()
+    for _ in range(max(1, min(args.requests, 5))):
+        prepare()
+        request(client)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'requests': args.requests,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, previous_path, threshold):
+    with open(previous_path) as f:
+        previous = json.load(f)['results']
+
+    regressions = 0
+    print(f'\nComparison with {previous_path}:')
+    for name, current in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        change = (current['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+        flags = []
+        if change > threshold:
+            flags.append('SLOWER')
+        if current['queries_per_request'] > before['queries_per_request']:
+            flags.append('MORE QUERIES')
+        regressions += bool(flags)
+        print(f'{name:25} p95 {before["p95_ms"]:9.2f} -> {current["p95_ms"]:9.2f} ms ({change:+.0%})   '
+              f'queries {before["queries_per_request"]:6.1f} -> {current["queries_per_request"]:6.1f}   '
+              + ' '.join(flags))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    path = args.db or temp_database('bench_routes.db')
+    if args.reuse_db:
+        use_database(path)
+        from app import app, db
+        summary = {'password': os.environ.get('BENCH_PASSWORD', 'password'), 'reused': path}
+    else:
+        app, db, summary = seed(path, args.depth, args.fanout, args.goals_per_user, args.updates_per_goal)
+    from sqlalchemy import event
+
+    with app.app_context():
+        query_counter = {'value': 0}
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*_):
+            query_counter['value'] += 1
+
+    scenarios = build_scenarios(app, db, summary)
+    if args.routes:
+        wanted = args.routes.split(',')
+        scenarios = {name: scenario for name, scenario in scenarios.items() if name in wanted}
+
+    states = {'cold': [True], 'warm': [False], 'both': [True, False]}[args.cache]
+    results = {}
+    print(f'\n{"route":25} {"p50":>9} {"p95":>9} {"p99":>9} {"queries":>8} {"peak KB":>9}')
+    for name, (client, request) in scenarios.items():
+        for cold in states:
+            label = name if cold else f'{name}:warm'
+            results[label] = run_scenario(app, client, request, args, query_counter, cold)
+            r = results[label]
+            print(f'{label:25} {r["p50_ms"]:9.2f} {r["p95_ms"]:9.2f} {r["p99_ms"]:9.2f} '
+                  f'{r["queries_per_request"]:8.1f} {r["peak_memory_kb"]:9.1f}')
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'dataset': {key: summary.get(key) for key in ('users', 'goals', 'updates')},
+            'params': vars(args),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Measures application startup: import time and the latency of the first requests.
+
+Every run starts a fresh interpreter, imports the app and sends its first
+requests through the test client: the login page, a manager's login and
+their dashboard (then the dashboard again, warm, for comparison). Two modes:
+
+- cold: STARTUP_PRELOAD off, everything is loaded by the first requests.
+- preload: get_app() warms the app up, then the requests are served by a
+  forked child, the way gunicorn --preload workers are (see gunicorn.conf.py).
+  The "get_app" column is the time spent in the master.
+
+    python -m benchmarks.bench_startup --runs 10
+
+Also times the first `flask db` command lookup, which sets up Flask-Migrate
+on demand.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.common import ROOT, make_parser, temp_database, seed
+
+PHASES = ('import', 'get_app', 'login_page', 'login', 'dashboard', 'dashboard_warm', 'db_command')
+
+
+def parse_args():
+    parser = make_parser(__doc__)
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per mode')
+    parser.add_argument('--modes', default='cold,preload')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def prepare(path):
+    app, db, summary = seed(path, 3, 5, 3, 3)
+    from app.models import User
+
+    with app.app_context():
+        email = db.session.query(User.email).filter_by(role='Manager').order_by(User.id).first()[0]
+        db.engine.dispose()
+    return email, summary['password']
+
+
+def milliseconds(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def child(mode):
+    """Runs in a fresh interpreter; prints the timings of one run as JSON."""
+    email, password = os.environ['BENCH_EMAIL'], os.environ['BENCH_PASSWORD']
+    timings = {}
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import app as package
+    timings['import'] = milliseconds(started)
+
+    started = time.perf_counter()
+    app = package.get_app()
+    timings['get_app'] = milliseconds(started)
+
+    def serve():
+        client = app.test_client()
+        for phase, method, url, data in (
+            ('login_page', 'get', '/login', None),
+            ('login', 'post', '/login', {'email': email, 'password': password}),
+            ('dashboard', 'get', '/dashboard', None),
+            ('dashboard_warm', 'get', '/dashboard', None),
+        ):
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data=data)
+            timings[phase] = milliseconds(started)
+            if response.status_code not in (200, 302):
+                sys.exit(f'{method.upper()} {url} answered {response.status_code}')
+
+        started = time.perf_counter()
+        app.cli.get_command(None, 'db')
+        timings['db_command'] = milliseconds(started)
+
+    if mode == 'preload':
+        # Requests are served by a forked worker; it reports back through a pipe
+        reader, writer = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(reader)
+            serve()
+            os.write(writer, json.dumps(timings).encode())
+            os._exit(0)
+        os.close(writer)
+        with os.fdopen(reader) as pipe:
+            timings = json.loads(pipe.read())
+        os.waitpid(pid, 0)
+    else:
+        serve()
+    print(json.dumps(timings))
+
+
+def run(mode, environment):
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--child', mode],
+        cwd=ROOT, env=environment, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    path = temp_database('bench_startup.db')
+    email, password = prepare(path)
+    base = dict(os.environ, DATABASE_URL='sqlite:///' + path, BENCH_EMAIL=email, BENCH_PASSWORD=password,
+                PASSWORD_HASH_WORKERS='0', CACHE_BACKEND='none', LEAGUE_RECOMPUTE_MODE='sync')
+
+    print(f'\nmedian ms over {args.runs} fresh processes')
+    print(f'{"mode":8} ' + ' '.join(f'{phase:>14}' for phase in PHASES))
+    for mode in args.modes.split(','):
+        environment = dict(base, STARTUP_PRELOAD='true' if mode == 'preload' else 'false')
+        runs = [run(mode, environment) for _ in range(args.runs)]
+        print(f'{mode:8} ' + ' '.join(
+            f'{statistics.median(timings[phase] for timings in runs):14.1f}' for phase in PHASES
+        ))
+
+
+if __name__ == '__main__':
+    main()
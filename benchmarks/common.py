@@ -0,0 +1,58 @@
+"""Helpers shared by the benchmark scripts: argument parsing, seeding, percentiles."""
+import argparse
+import math
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_parser(doc, **dataset):
+    """
+    Argument parser described by the first line of the script's docstring.
+    Keyword arguments (depth=3, fanout=10, ...) add the matching dataset size
+    options with those defaults.
+    """
+    parser = argparse.ArgumentParser(description=doc.strip().splitlines()[0])
+    for name, default in dataset.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=int, default=default)
+    return parser
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile; 0.0 when nothing was measured
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def temp_database(name):
+    return os.path.join(tempfile.mkdtemp(), name)
+
+
+def use_database(path):
+    """Points the app at the SQLite file `path`. Call before importing app."""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def seed(path, depth, fanout, goals_per_user, updates_per_goal):
+    """
+    Creates a fresh database at `path` filled with a generated organization
+    (see app/datagen.py). Returns (app, db, summary).
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    use_database(path)
+    from app import app, db
+    from app.datagen import generate
+
+    with app.app_context():
+        db.create_all()
+        summary = generate(depth, fanout, goals_per_user, updates_per_goal)
+    print(f"Seeded {summary['users']} users, {summary['goals']} goals and "
+          f"{summary['updates']} updates in {summary['seconds']}s")
+    return app, db, summary
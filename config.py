@@ -12,4 +12,100 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     
     # Disable a feature of Flask-SQLAlchemy that we don't need
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Engine profile (see app/engine.py): 'default' or 'production', which
+    # enables WAL and the pragmas below on SQLite and pool tuning elsewhere
+    DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'default')
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_BEGIN_IMMEDIATE = os.environ.get('SQLITE_BEGIN_IMMEDIATE', 'true').lower() in ('1', 'true', 'yes')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE = 1800 # seconds, below typical server idle timeouts
+    DB_POOL_PRE_PING = True
+
+    # get_app() warms the app up before serving: templates, mappers,
+    # leaderboards, one connection per engine and the reference password hash
+    # (app/startup.py).
+    # gunicorn.conf.py turns it on so it runs once in the master.
+    STARTUP_PRELOAD = os.environ.get('STARTUP_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+    # Optional read replica for the read-only views (see app/replica.py).
+    # Users who just wrote read from the primary for REPLICA_MAX_LAG_SECONDS.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+
+    # Per-request SQL instrumentation (query count, DB time, slowest statements).
+    # Off by default; when off no listeners are installed at all.
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_LOG_COUNT = 5 # Slowest statements included in a slow request log
+    SERVER_TIMING_HEADER = True
+
+    # Password hashing (see app/passwords.py). Hashes made with other
+    # parameters are upgraded on the next successful login. Each app process
+    # runs up to PASSWORD_HASH_WORKERS checks in parallel on a process pool
+    # (0: inline) and answers 503 once PASSWORD_HASH_MAX_PENDING are queued.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+    PASSWORD_HASH_TIMEOUT = 10 # seconds a login waits for its check
+    PASSWORD_HASH_RETRY_AFTER = 2 # seconds, sent with the 503
+
+    # Goal history pagination
+    HISTORY_PAGE_SIZE = 50
+    HISTORY_MAX_PAGE_SIZE = 500
+
+    # /org_goals pagination (goals of everyone below a manager)
+    ORG_GOALS_PAGE_SIZE = 100
+    ORG_GOALS_MAX_PAGE_SIZE = 500
+
+    # League recomputation after progress updates: 'async' runs it on a
+    # background thread pool after the commit, 'sync' inside the request (tests)
+    LEAGUE_RECOMPUTE_MODE = os.environ.get('LEAGUE_RECOMPUTE_MODE', 'async')
+    LEAGUE_RECOMPUTE_WORKERS = 2
+
+    # `flask archive-updates` moves progress updates older than this into
+    # the archive table, this many per transaction
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = 5000
+
+    # Largest batch accepted by /update_goals
+    BULK_UPDATE_MAX_ITEMS = 1000
+
+    # Longest window served by /team_analytics, in days
+    ANALYTICS_MAX_DAYS = 730
+
+    # Most results of each kind returned by /search
+    SEARCH_MAX_RESULTS = 100
+
+    # Leaderboards: largest page served, and how often each worker rebuilds
+    # its boards from the database to pick up other workers' writes
+    LEADERBOARD_MAX_LIMIT = 100
+    LEADERBOARD_REBUILD_SECONDS = 300
+
+    # Live event streams (/events). Each open stream occupies a worker for
+    # as long as the dashboard is open, so only enable them with an async
+    # worker (gunicorn -k gevent). Buffered events per subscriber before it is
+    # told to resync, keep-alive interval, and connection limit per process.
+    EVENTS_ENABLED = os.environ.get('EVENTS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    EVENTS_QUEUE_SIZE = 100
+    EVENTS_KEEPALIVE_SECONDS = 15
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 5000))
+
+    # View cache: 'memory' (per-process LRU; single-process servers only,
+    # since other workers never see its invalidations), 'sqlite' (file
+    # shared by the workers on one host) or 'none'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DEFAULT_TTL = 60 # seconds
+    CACHE_MAX_ENTRIES = 5000
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')
+
+    # Cache of logged-in users' id/role/manager/league, used for permission
+    # checks; entries are dropped when those columns change
+    IDENTITY_CACHE_TTL = 30 # seconds
+    IDENTITY_CACHE_MAX_ENTRIES = 10000
@@ -0,0 +1,19 @@
+import os
+
+# gunicorn -c gunicorn.conf.py
+#
+# The app is loaded (and warmed up by get_app(), see app/startup.py) once
+# in the master, then forked into the workers, which share the compiled
+# templates and configured mappers copy-on-write and open their own
+# database connections.
+
+wsgi_app = 'run:app'
+preload_app = True
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+
+os.environ.setdefault('STARTUP_PRELOAD', 'true')
+os.environ.setdefault('DATABASE_PROFILE', 'production')
+if workers > 1:
+    # The memory cache can't see the other workers' invalidations
+    os.environ.setdefault('CACHE_BACKEND', 'sqlite')
@@ -0,0 +1,68 @@
+"""Add UserScore and TeamScore tables for cached performance scores
+
+Revision ID: 3b9e1f47c2a8
+Revises: d6c4330ff3eb
+Create Date: 2026-10-18 09:12:40.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e1f47c2a8'
+down_revision = 'd6c4330ff3eb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_score',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_weight', sa.Integer(), nullable=False),
+    sa.Column('weighted_progress', sa.Float(), nullable=False),
+    sa.Column('performance_score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('team_score',
+    sa.Column('manager_id', sa.Integer(), nullable=False),
+    sa.Column('total_weight', sa.Integer(), nullable=False),
+    sa.Column('weighted_progress', sa.Float(), nullable=False),
+    sa.Column('avg_progress', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['manager_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('manager_id')
+    )
+
+    # Fill both tables the way app.scores.rebuild_scores() does, so the
+    # incremental deltas applied from now on start from the right totals
+    op.execute(
+        'INSERT INTO user_score (user_id, total_weight, weighted_progress, performance_score) '
+        'SELECT user_id, SUM(weight), SUM(progress * weight), 0 FROM ('
+        ' SELECT user_id, weight, CASE'
+        '  WHEN target_value = 0 THEN 100'
+        '  WHEN CAST(COALESCE(current_value, 0) AS FLOAT) / target_value * 100 > 100 THEN 100'
+        '  ELSE CAST(COALESCE(current_value, 0) AS FLOAT) / target_value * 100'
+        ' END AS progress FROM goal WHERE user_id IS NOT NULL'
+        ') AS goal_progress GROUP BY user_id'
+    )
+    op.execute(
+        'INSERT INTO team_score (manager_id, total_weight, weighted_progress, avg_progress) '
+        'SELECT "user".manager_id, SUM(user_score.total_weight), SUM(user_score.weighted_progress), 0 '
+        'FROM user_score JOIN "user" ON "user".id = user_score.user_id '
+        'WHERE "user".manager_id IS NOT NULL GROUP BY "user".manager_id'
+    )
+    # Same rounding as app.scores._score_column()
+    op.execute(
+        'UPDATE user_score SET performance_score = CASE WHEN total_weight > 0 '
+        'THEN CAST(weighted_progress / total_weight + 1e-9 AS INTEGER) ELSE 0 END'
+    )
+    op.execute(
+        'UPDATE team_score SET avg_progress = CASE WHEN total_weight > 0 '
+        'THEN CAST(weighted_progress / total_weight + 1e-9 AS INTEGER) ELSE 0 END'
+    )
+
+
+def downgrade():
+    op.drop_table('team_score')
+    op.drop_table('user_score')
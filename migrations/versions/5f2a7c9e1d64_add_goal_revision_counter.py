@@ -0,0 +1,26 @@
+"""Add Goal.revision change counter for ETags
+
+Revision ID: 5f2a7c9e1d64
+Revises: 8c41d2e9a7f3
+Create Date: 2026-10-18 13:21:05.772514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a7c9e1d64'
+down_revision = '8c41d2e9a7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,42 @@
+"""Add foreign-key and composite indexes for the hot query paths
+
+Revision ID: 8c41d2e9a7f3
+Revises: 3b9e1f47c2a8
+Create Date: 2026-10-18 10:03:27.540961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e9a7f3'
+down_revision = '3b9e1f47c2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # goal.user_id and progress_update.goal_id are covered by the leading
+    # column of the composite indexes, so they don't get indexes of their own.
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_manager_id'), ['manager_id'], unique=False)
+
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.create_index('ix_goal_user_id_status', ['user_id', 'status'], unique=False)
+
+    with op.batch_alter_table('progress_update', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_progress_update_user_id'), ['user_id'], unique=False)
+        batch_op.create_index('ix_progress_update_goal_id_timestamp', ['goal_id', sa.text('timestamp DESC')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('progress_update', schema=None) as batch_op:
+        batch_op.drop_index('ix_progress_update_goal_id_timestamp')
+        batch_op.drop_index(batch_op.f('ix_progress_update_user_id'))
+
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.drop_index('ix_goal_user_id_status')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_manager_id'))
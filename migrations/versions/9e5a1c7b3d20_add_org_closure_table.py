@@ -0,0 +1,50 @@
+"""Add org_closure table of the reporting hierarchy
+
+Revision ID: 9e5a1c7b3d20
+Revises: f4b8d27a61c3
+Create Date: 2026-10-18 19:02:13.540217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e5a1c7b3d20'
+down_revision = 'f4b8d27a61c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('org_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['descendant_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    with op.batch_alter_table('org_closure', schema=None) as batch_op:
+        batch_op.create_index('ix_org_closure_descendant_id_depth', ['descendant_id', 'depth'], unique=False)
+
+    # Every user paired with themselves, then every ancestor at any depth
+    # (capped like app.aggregates.MAX_ORG_DEPTH)
+    op.execute('INSERT INTO org_closure (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM "user"')
+    op.execute(
+        'INSERT INTO org_closure (ancestor_id, descendant_id, depth) '
+        'WITH RECURSIVE org_tree (ancestor_id, descendant_id, depth) AS ('
+        ' SELECT manager_id, id, 1 FROM "user" WHERE manager_id IS NOT NULL'
+        ' UNION ALL'
+        ' SELECT org_tree.ancestor_id, child.id, org_tree.depth + 1 FROM org_tree'
+        ' JOIN "user" AS child ON child.manager_id = org_tree.descendant_id'
+        ' WHERE org_tree.depth < 256'
+        ') SELECT ancestor_id, descendant_id, depth FROM org_tree'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('org_closure', schema=None) as batch_op:
+        batch_op.drop_index('ix_org_closure_descendant_id_depth')
+
+    op.drop_table('org_closure')
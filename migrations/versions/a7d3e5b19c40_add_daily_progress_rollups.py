@@ -0,0 +1,82 @@
+"""Add daily progress rollup tables for the analytics endpoint
+
+Revision ID: a7d3e5b19c40
+Revises: 5f2a7c9e1d64
+Create Date: 2026-10-18 15:02:17.430961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5b19c40'
+down_revision = '5f2a7c9e1d64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('goal_daily_progress',
+    sa.Column('goal_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('update_count', sa.Integer(), nullable=False),
+    sa.Column('closing_value', sa.Integer(), nullable=True),
+    sa.Column('closing_progress', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['goal_id'], ['goal.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('goal_id', 'day')
+    )
+    op.create_table('user_daily_progress',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('update_count', sa.Integer(), nullable=False),
+    sa.Column('weighted_delta', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+    # Fill both tables from the existing audit trail, like
+    # app.analytics.backfill_daily_progress(): every goal starts at 0
+    # progress and updates of deleted goals are dropped
+    if op.get_bind().dialect.name == 'sqlite':
+        day = 'date(progress_update.timestamp)'
+    else:
+        day = 'CAST(progress_update.timestamp AS DATE)'
+    history = (
+        'SELECT progress_update.id, progress_update.goal_id, progress_update.user_id, '
+        'progress_update.update_value, progress_update.timestamp, ' + day + ' AS day, '
+        'COALESCE(goal.weight, 0) AS weight, CASE'
+        ' WHEN goal.target_value = 0 THEN 100.0'
+        ' WHEN CAST(progress_update.update_value AS FLOAT) / goal.target_value * 100 > 100 THEN 100.0'
+        ' ELSE CAST(progress_update.update_value AS FLOAT) / goal.target_value * 100'
+        ' END AS progress '
+        'FROM progress_update JOIN goal ON goal.id = progress_update.goal_id '
+        'WHERE progress_update.timestamp IS NOT NULL'
+    )
+    # The last update of each goal and day closes it
+    op.execute(
+        'INSERT INTO goal_daily_progress '
+        '(goal_id, day, user_id, update_count, closing_value, closing_progress) '
+        'SELECT goal_id, day, user_id, update_count, update_value, progress FROM ('
+        ' SELECT goal_id, day, user_id, update_value, progress,'
+        ' COUNT(*) OVER (PARTITION BY goal_id, day) AS update_count,'
+        ' ROW_NUMBER() OVER (PARTITION BY goal_id, day ORDER BY timestamp DESC, id DESC) AS from_last'
+        ' FROM (' + history + ') AS history'
+        ') AS goal_days WHERE from_last = 1'
+    )
+    # Each update moves its author's weighted sum by the goal's progress change
+    op.execute(
+        'INSERT INTO user_daily_progress (user_id, day, update_count, weighted_delta) '
+        'SELECT user_id, day, COUNT(*), SUM((progress - previous) * weight) FROM ('
+        ' SELECT user_id, day, weight, progress,'
+        ' LAG(progress, 1, 0.0) OVER (PARTITION BY goal_id ORDER BY timestamp, id) AS previous'
+        ' FROM (' + history + ') AS history'
+        ') AS changes WHERE user_id IS NOT NULL GROUP BY user_id, day'
+    )
+
+
+def downgrade():
+    op.drop_table('user_daily_progress')
+    op.drop_table('goal_daily_progress')
@@ -0,0 +1,52 @@
+"""Add FTS5 index over archived progress update comments
+
+Revision ID: b8e4f2a6c913
+Revises: 9e5a1c7b3d20
+Create Date: 2026-10-19 10:14:36.502184
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f2a6c913'
+down_revision = '9e5a1c7b3d20'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the statements app/search.py runs for the archive index
+TABLES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS progress_update_archive_fts USING fts5("
+    "comment, content='progress_update_archive', content_rowid='id', tokenize='porter unicode61')",
+]
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS progress_update_archive_fts_ai AFTER INSERT ON progress_update_archive BEGIN "
+    "INSERT INTO progress_update_archive_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_archive_fts_ad AFTER DELETE ON progress_update_archive BEGIN "
+    "INSERT INTO progress_update_archive_fts(progress_update_archive_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_archive_fts_au AFTER UPDATE OF comment "
+    "ON progress_update_archive BEGIN "
+    "INSERT INTO progress_update_archive_fts(progress_update_archive_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); "
+    "INSERT INTO progress_update_archive_fts(rowid, comment) VALUES (new.id, new.comment); END",
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in TABLES + TRIGGERS:
+        op.execute(statement)
+    # Comments archived before this revision
+    op.execute("INSERT INTO progress_update_archive_fts(progress_update_archive_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for name in ('progress_update_archive_fts_ai', 'progress_update_archive_fts_ad',
+                 'progress_update_archive_fts_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    op.execute('DROP TABLE IF EXISTS progress_update_archive_fts')
@@ -0,0 +1,70 @@
+"""Add FTS5 full-text search index over goals and update comments
+
+Revision ID: c2f81a6d4e95
+Revises: a7d3e5b19c40
+Create Date: 2026-10-18 16:40:52.208817
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f81a6d4e95'
+down_revision = 'a7d3e5b19c40'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the statements app/search.py ran at this revision; later
+# changes to the index get their own migration. Only SQLite gets an index;
+# other engines use the LIKE fallback.
+TABLES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS goal_fts USING fts5("
+    "title, description, manager_feedback, content='goal', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS progress_update_fts USING fts5("
+    "comment, content='progress_update', content_rowid='id', tokenize='porter unicode61')",
+]
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS goal_fts_ai AFTER INSERT ON goal BEGIN "
+    "INSERT INTO goal_fts(rowid, title, description, manager_feedback) "
+    "VALUES (new.id, new.title, new.description, new.manager_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS goal_fts_ad AFTER DELETE ON goal BEGIN "
+    "INSERT INTO goal_fts(goal_fts, rowid, title, description, manager_feedback) "
+    "VALUES ('delete', old.id, old.title, old.description, old.manager_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS goal_fts_au AFTER UPDATE OF title, description, manager_feedback "
+    "ON goal BEGIN "
+    "INSERT INTO goal_fts(goal_fts, rowid, title, description, manager_feedback) "
+    "VALUES ('delete', old.id, old.title, old.description, old.manager_feedback); "
+    "INSERT INTO goal_fts(rowid, title, description, manager_feedback) "
+    "VALUES (new.id, new.title, new.description, new.manager_feedback); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_fts_ai AFTER INSERT ON progress_update BEGIN "
+    "INSERT INTO progress_update_fts(rowid, comment) VALUES (new.id, new.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_fts_ad AFTER DELETE ON progress_update BEGIN "
+    "INSERT INTO progress_update_fts(progress_update_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS progress_update_fts_au AFTER UPDATE OF comment ON progress_update BEGIN "
+    "INSERT INTO progress_update_fts(progress_update_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); "
+    "INSERT INTO progress_update_fts(rowid, comment) VALUES (new.id, new.comment); END",
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in TABLES + TRIGGERS:
+        op.execute(statement)
+    # Index the rows that already exist
+    op.execute("INSERT INTO goal_fts(goal_fts) VALUES ('rebuild')")
+    op.execute("INSERT INTO progress_update_fts(progress_update_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for name in ('goal_fts_ai', 'goal_fts_ad', 'goal_fts_au',
+                 'progress_update_fts_ai', 'progress_update_fts_ad', 'progress_update_fts_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    op.execute('DROP TABLE IF EXISTS progress_update_fts')
+    op.execute('DROP TABLE IF EXISTS goal_fts')
@@ -0,0 +1,60 @@
+"""Add progress update archive and per-goal archive summary tables
+
+Revision ID: f4b8d27a61c3
+Revises: c2f81a6d4e95
+Create Date: 2026-10-18 18:21:40.118352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d27a61c3'
+down_revision = 'c2f81a6d4e95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('progress_update_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('update_value', sa.Integer(), nullable=False),
+    sa.Column('comment', sa.Text(), nullable=False),
+    sa.Column('proof_url', sa.String(length=500), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('goal_id', sa.Integer(), nullable=True),
+    sa.Column('period', sa.String(length=7), nullable=False),
+    sa.ForeignKeyConstraint(['goal_id'], ['goal.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('progress_update_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_progress_update_archive_period'), ['period'], unique=False)
+        batch_op.create_index('ix_progress_update_archive_goal_id_timestamp', ['goal_id', sa.text('timestamp DESC')], unique=False)
+
+    op.create_table('progress_archive_summary',
+    sa.Column('goal_id', sa.Integer(), nullable=False),
+    sa.Column('archived_count', sa.Integer(), nullable=False),
+    sa.Column('first_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('last_update_id', sa.Integer(), nullable=True),
+    sa.Column('last_value', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['goal_id'], ['goal.id'], ),
+    sa.PrimaryKeyConstraint('goal_id')
+    )
+
+
+def downgrade():
+    # Move archived updates back into the audit trail before dropping the archive
+    op.execute(
+        'INSERT INTO progress_update (id, update_value, comment, proof_url, timestamp, user_id, goal_id) '
+        'SELECT id, update_value, comment, proof_url, timestamp, user_id, goal_id FROM progress_update_archive'
+    )
+    op.drop_table('progress_archive_summary')
+    with op.batch_alter_table('progress_update_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_progress_update_archive_goal_id_timestamp')
+        batch_op.drop_index(batch_op.f('ix_progress_update_archive_period'))
+
+    op.drop_table('progress_update_archive')
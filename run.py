@@ -1 +1,6 @@
-from app import app
\ No newline at end of file
+from app import get_app
+
+app = get_app()
+
+if __name__ == '__main__':
+    app.run()
@@ -1,5 +1,6 @@
 from app import app, db
 from app.models import User, Goal
+from app.datagen import clear_data, generate
 
 def seed_data():
     """
@@ -7,11 +8,10 @@ def seed_data():
     """
     with app.app_context():
         # --- Step 1: Clear all existing data ---
-        # The order is important to avoid foreign key constraint errors.
-        # Goals must be deleted before users.
+        # clear_data() deletes in foreign key order: audit trail, cached
+        # scores, goals and finally users.
         print("Clearing existing data...")
-        db.session.query(Goal).delete()
-        db.session.query(User).delete()
+        clear_data()
         print("Data cleared.")
 
         # --- Step 2: Create the users ---
@@ -106,7 +106,40 @@ def seed_data():
         print("Database seeding complete!")
         print("You can now log in with the sample accounts.")
 
+def seed_synthetic(args):
+    """
+    Generates a large synthetic organization instead of the sample accounts.
+    """
+    with app.app_context():
+        summary = generate(
+            depth=args.depth,
+            fanout=args.fanout,
+            goals_per_user=args.goals_per_user,
+            updates_per_goal=args.updates_per_goal,
+            password=args.password,
+            seed=args.seed
+        )
+        print(f"Generated {summary['users']} users, {summary['goals']} goals and "
+              f"{summary['updates']} updates in {summary['seconds']}s.")
+        print(f"Sample logins (password '{args.password}'): {summary['admin_email']}, "
+              f"{summary['manager_email']}, {summary['employee_email']}")
+
 # This allows the script to be run from the command line
 if __name__ == '__main__':
-    seed_data()
+    import argparse
+    parser = argparse.ArgumentParser(description='Populate the database.')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='Generate a large synthetic organization instead of the sample accounts.')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--goals-per-user', type=int, default=5)
+    parser.add_argument('--updates-per-goal', type=int, default=5)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        seed_synthetic(args)
+    else:
+        seed_data()
 
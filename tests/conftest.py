@@ -0,0 +1,67 @@
+import os
+import tempfile
+from types import SimpleNamespace
+import pytest
+
+# The app is built when the package is imported, so the test database and
+# settings have to be in the environment before the first `import app`.
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'),
+    'LEAGUE_RECOMPUTE_MODE': 'sync',
+    'CACHE_BACKEND': 'memory',
+    'PASSWORD_HASH_WORKERS': '0',
+    'STARTUP_PRELOAD': 'false',
+    'SQL_INSTRUMENTATION': 'false',
+})
+
+from app import app as flask_app, db
+from app.cache import view_cache
+from app.datagen import generate
+from app.models import User
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+
+@pytest.fixture
+def org(app):
+    """
+    A small generated organization (see app/datagen.py): two top-level
+    managers with two managers each, and two employees below every one of
+    those. Returns the ids the tests log in as.
+    """
+    with app.app_context():
+        generate(depth=3, fanout=2, goals_per_user=2, updates_per_goal=3)
+        view_cache.clear()
+
+        admin = User.query.filter_by(role='Administrator').one()
+        top, other_top = User.query.filter_by(role='Manager', manager_id=None).order_by(User.id).limit(2)
+        middle = top.reports.order_by(User.id).first()
+        employee = middle.reports.order_by(User.id).first()
+        other_middle = other_top.reports.order_by(User.id).first()
+        outsider = other_middle.reports.order_by(User.id).first()
+        return SimpleNamespace(
+            admin=admin.id, top=top.id, middle=middle.id, employee=employee.id,
+            other_top=other_top.id, other_middle=other_middle.id, outsider=outsider.id,
+            employee_goal=employee.goals.first().id, outsider_goal=outsider.goals.first().id,
+        )
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """login(user_id) signs the test client in as that user."""
+    def login_as(user_id):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        return client
+    return login_as
@@ -0,0 +1,73 @@
+from app import db
+from app.cache import view_cache
+from app.models import User, Goal
+
+# Cached views must be dropped by committed writes and only by those.
+
+
+def misses(view):
+    return view_cache.stats[view]['misses']
+
+
+def complete_goals(app, client, user_id):
+    with app.app_context():
+        goals = [(goal.id, goal.target_value) for goal in Goal.query.filter_by(user_id=user_id)]
+    for goal_id, target in goals:
+        response = client.post(f'/update_goal/{goal_id}', data={'progress': target, 'status': 'Completed',
+                                                                'comment': 'Done'})
+        assert response.status_code == 200
+
+
+def test_profile_is_served_from_cache_until_the_user_writes(app, org, login):
+    client = login(org.employee)
+    client.get('/profile')
+    before = misses('profile')
+    client.get('/profile')
+    assert misses('profile') == before
+
+    complete_goals(app, client, org.employee)
+    page = client.get('/profile').get_data(as_text=True)
+    assert misses('profile') == before + 1
+    assert '<progress value="100"' in page
+
+
+def test_report_updates_invalidate_the_managers_dashboard(app, org, login):
+    login(org.middle).get('/dashboard')
+    before = misses('dashboard')
+    login(org.middle).get('/dashboard')
+    assert misses('dashboard') == before
+
+    complete_goals(app, login(org.employee), org.employee)
+    login(org.middle).get('/dashboard')
+    assert misses('dashboard') == before + 1
+
+
+def test_moving_a_report_invalidates_both_managers(app, org, login):
+    for manager in (org.middle, org.other_middle):
+        login(manager).get('/dashboard')
+    before = misses('dashboard')
+
+    with app.app_context():
+        db.session.get(User, org.employee).manager_id = org.other_middle
+        db.session.commit()
+
+    for manager in (org.middle, org.other_middle):
+        login(manager).get('/dashboard')
+    assert misses('dashboard') == before + 2
+
+
+def test_rolled_back_writes_keep_the_cache(app, org, login):
+    client = login(org.employee)
+    client.get('/profile')
+    before = misses('profile')
+
+    with app.app_context():
+        db.session.get(Goal, org.employee_goal).current_value = 0
+        db.session.flush()
+        db.session.rollback()
+        # The next commit in the session must not carry the discarded changes
+        db.session.get(Goal, org.outsider_goal).current_value = 0
+        db.session.commit()
+
+    client.get('/profile')
+    assert misses('profile') == before
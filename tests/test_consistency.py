@@ -0,0 +1,109 @@
+import random
+import pytest
+from app import db
+from app.hierarchy import ReportingCycle, rebuild_org_closure
+from app.models import User, Goal, UserScore, TeamScore, OrgClosure
+from app.scores import rebuild_scores
+
+# The score store and the reporting closure are maintained incrementally by
+# session hooks; after any mix of edits they must match a full rebuild.
+
+
+def score_tables():
+    def rows(model, key):
+        # Rows left with nothing in them are equivalent to missing rows
+        return {
+            getattr(row, key): (row.total_weight, round(row.weighted_progress, 6), score)
+            for row in model.query
+            for score in [row.performance_score if model is UserScore else row.avg_progress]
+            if row.total_weight or abs(row.weighted_progress) > 1e-6
+        }
+    return rows(UserScore, 'user_id'), rows(TeamScore, 'manager_id')
+
+
+def closure_rows():
+    return set(db.session.query(OrgClosure.ancestor_id, OrgClosure.descendant_id, OrgClosure.depth))
+
+
+def edit_goals(rng, user_ids):
+    goals = Goal.query.all()
+    for _ in range(rng.randint(1, 6)):
+        goal = rng.choice(goals)
+        action = rng.choice(['progress', 'progress', 'target', 'weight', 'owner', 'create', 'delete'])
+        if action == 'progress':
+            goal.current_value = rng.randint(0, 120)
+        elif action == 'target':
+            goal.target_value = rng.choice([0, 10, 50, 100])
+        elif action == 'weight':
+            goal.weight = rng.randint(1, 10)
+        elif action == 'owner':
+            goal.user_id = rng.choice(user_ids)
+        elif action == 'create':
+            db.session.add(Goal(title='New goal', user_id=rng.choice(user_ids),
+                                current_value=rng.randint(0, 50), target_value=50, weight=rng.randint(1, 5)))
+        elif goal in goals:
+            goals.remove(goal)
+            db.session.delete(goal)
+
+
+def move_user(rng, users):
+    user = rng.choice(users)
+    managers = [candidate.id for candidate in users if candidate.role == 'Manager' and candidate is not user]
+    user.manager_id = rng.choice(managers) if managers and rng.random() < 0.9 else None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_scores_match_rebuild_after_random_edits(app, org, seed):
+    rng = random.Random(seed)
+    with app.app_context():
+        users = User.query.filter(User.role != 'Administrator').all()
+        user_ids = [user.id for user in users]
+        for _ in range(30):
+            edit_goals(rng, user_ids)
+            if rng.random() < 0.3:
+                move_user(rng, users)
+            try:
+                if rng.random() < 0.2:
+                    db.session.flush()
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+            except ReportingCycle:
+                db.session.rollback()
+
+        incremental = score_tables()
+        rebuild_scores()
+        assert score_tables() == incremental
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_org_closure_matches_rebuild_after_random_moves(app, org, seed):
+    rng = random.Random(seed)
+    with app.app_context():
+        for _ in range(30):
+            users = User.query.filter(User.role != 'Administrator').all()
+            move_user(rng, users)
+            if rng.random() < 0.1:
+                db.session.add(User(full_name='New hire', email=f'new{rng.random()}@gov.in',
+                                    role='Employee', manager_id=rng.choice(users).id))
+            try:
+                db.session.commit()
+            except ReportingCycle:
+                db.session.rollback()
+
+        incremental = closure_rows()
+        rebuild_org_closure()
+        assert closure_rows() == incremental
+        db.session.rollback()
+
+
+def test_moving_a_manager_below_their_own_report_is_rejected(app, org):
+    with app.app_context():
+        before = closure_rows()
+        db.session.get(User, org.top).manager_id = org.employee
+        with pytest.raises(ReportingCycle):
+            db.session.commit()
+        db.session.rollback()
+
+        assert db.session.get(User, org.top).manager_id is None
+        assert closure_rows() == before
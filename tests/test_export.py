@@ -0,0 +1,48 @@
+import csv
+import io
+import pytest
+from app import db
+from app.archive import archive_progress_updates
+from app.hierarchy import org_member_ids
+from app.models import Goal, ProgressUpdate, ProgressUpdateArchive
+
+
+def read_csv(response):
+    assert response.status_code == 200
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+@pytest.mark.parametrize('user', ['top', 'employee'])
+def test_exports_are_admin_only(org, login, user):
+    assert login(getattr(org, user)).get('/export/goals.csv').status_code == 403
+    assert login(getattr(org, user)).get(f'/export/goals.csv?manager_id={getattr(org, user)}').status_code == 403
+
+
+def test_goal_export_filtered_by_subtree(app, org, login):
+    client = login(org.admin)
+    everything = read_csv(client.get('/export/goals.csv'))
+    subtree = read_csv(client.get(f'/export/goals.csv?manager_id={org.middle}'))
+
+    with app.app_context():
+        assert len(everything) == Goal.query.count()
+        members = set(db.session.scalars(org_member_ids(org.middle, include_self=True)))
+    assert {int(row['owner_id']) for row in subtree} == members
+    assert len(subtree) < len(everything)
+
+
+def test_update_export_includes_archived_updates(app, org, login):
+    with app.app_context():
+        archive_progress_updates(older_than_days=180)
+        hot = ProgressUpdate.query.count()
+        archived = ProgressUpdateArchive.query.count()
+    assert hot and archived
+
+    rows = read_csv(login(org.admin).get('/export/updates.csv'))
+    assert len(rows) == hot + archived
+    assert len({row['update_id'] for row in rows}) == len(rows)
+
+
+def test_export_rejects_bad_input(org, login):
+    client = login(org.admin)
+    assert client.get('/export/users.csv').status_code == 404
+    assert client.get('/export/updates.csv?start=yesterday').status_code == 400
@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.archive import archive_progress_updates
+from app.models import ProgressUpdate, ProgressUpdateArchive
+
+
+@pytest.fixture
+def long_history(app, org):
+    """
+    Gives the employee's goal a year of updates (two sharing a timestamp),
+    archives everything older than 100 days and returns the ids of all its
+    updates, newest first.
+    """
+    with app.app_context():
+        now = datetime.utcnow().replace(microsecond=0)
+        for days in (0, 20, 40, 40, 90, 130, 170, 220, 260, 300, 340):
+            db.session.add(ProgressUpdate(goal_id=org.employee_goal, user_id=org.employee, update_value=days,
+                                          comment=f'{days} days ago', timestamp=now - timedelta(days=days)))
+        db.session.commit()
+        expected = [update_id for update_id, in db.session.query(ProgressUpdate.id)
+                    .filter_by(goal_id=org.employee_goal)
+                    .order_by(ProgressUpdate.timestamp.desc(), ProgressUpdate.id.desc())]
+
+        archive_progress_updates(older_than_days=100)
+        assert ProgressUpdateArchive.query.filter_by(goal_id=org.employee_goal).count() >= 5
+        assert ProgressUpdate.query.filter_by(goal_id=org.employee_goal).count() >= 5
+        return expected
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 5, 50])
+def test_history_cursor_pages_across_hot_and_archived_rows(org, login, long_history, limit):
+    client = login(org.employee)
+    seen, cursor = [], None
+    while True:
+        url = f'/get_goal_history/{org.employee_goal}?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url).json
+        assert len(page['history']) <= limit
+        seen += [entry['id'] for entry in page['history']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == long_history
+
+
+def test_ndjson_stream_matches_the_pages(org, login, long_history):
+    response = login(org.employee).get(f'/get_goal_history/{org.employee_goal}?format=ndjson')
+    header, *entries = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert header['success']
+    assert [entry['id'] for entry in entries] == long_history
+
+
+def test_invalid_cursor_is_rejected(org, login):
+    response = login(org.employee).get(f'/get_goal_history/{org.employee_goal}?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_goal_history_etag_revalidates(org, login):
+    client = login(org.employee)
+    url = f'/get_goal_history/{org.employee_goal}'
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers['ETag']
+
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    client.post(f'/update_goal/{org.employee_goal}', data={'progress': 3, 'status': 'In Progress',
+                                                           'comment': 'New entry'})
+    changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert changed.json['history'][0]['comment'] == 'New entry'
+
+
+def test_employee_goals_etag_changes_with_feedback(org, login):
+    client = login(org.middle)
+    url = f'/get_employee_goals/{org.employee}'
+    first = client.get(url)
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    client.post(f'/add_feedback/{org.employee_goal}', data={'feedback': 'Keep going'})
+    changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert 'Keep going' in [goal['feedback'] for goal in changed.json['goals']]
@@ -0,0 +1,90 @@
+import pytest
+from app import db
+from app.models import Goal
+
+# Who may see and change what: employees their own goals, managers everyone
+# below them at any depth, administrators the organization-wide views.
+
+
+def test_anonymous_requests_are_rejected(client, org):
+    assert client.get('/dashboard').status_code == 302
+    assert client.post(f'/update_goal/{org.employee_goal}', data={'comment': 'x'}).status_code == 401
+    assert client.get(f'/get_goal_history/{org.employee_goal}').status_code == 401
+    assert client.get('/org_goals').status_code == 401
+    assert client.get('/search?q=goal').status_code == 401
+
+
+def test_only_the_owner_updates_a_goal(app, org, login):
+    form = {'progress': 7, 'status': 'In Progress', 'comment': 'Weekly check-in'}
+    assert login(org.top).post(f'/update_goal/{org.employee_goal}', data=form).status_code == 403
+    assert login(org.outsider).post(f'/update_goal/{org.employee_goal}', data=form).status_code == 403
+
+    response = login(org.employee).post(f'/update_goal/{org.employee_goal}', data=form)
+    assert response.status_code == 200 and response.json['success']
+    with app.app_context():
+        assert db.session.get(Goal, org.employee_goal).current_value == 7
+
+
+@pytest.mark.parametrize('manager', ['middle', 'top'])
+def test_direct_and_skip_level_managers_leave_feedback(app, org, login, manager):
+    response = login(getattr(org, manager)).post(f'/add_feedback/{org.employee_goal}',
+                                                 data={'feedback': f'From {manager}'})
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(Goal, org.employee_goal).manager_feedback == f'From {manager}'
+
+
+@pytest.mark.parametrize('user', ['other_top', 'other_middle', 'employee', 'admin'])
+def test_feedback_outside_the_reporting_line_is_denied(app, org, login, user):
+    response = login(getattr(org, user)).post(f'/add_feedback/{org.employee_goal}', data={'feedback': 'No'})
+    assert response.status_code == 403
+    with app.app_context():
+        assert db.session.get(Goal, org.employee_goal).manager_feedback != 'No'
+
+
+@pytest.mark.parametrize('user, status', [
+    ('middle', 200), ('top', 200), ('other_top', 403), ('employee', 403), ('admin', 403),
+])
+def test_employee_goals_visible_to_managers_above(org, login, user, status):
+    assert login(getattr(org, user)).get(f'/get_employee_goals/{org.employee}').status_code == status
+
+
+@pytest.mark.parametrize('user, status', [
+    ('employee', 200), ('middle', 200), ('top', 200), ('outsider', 403), ('other_top', 403),
+])
+def test_goal_history_visible_to_owner_and_managers_above(org, login, user, status):
+    assert login(getattr(org, user)).get(f'/get_goal_history/{org.employee_goal}').status_code == status
+
+
+def test_org_goals_cover_the_whole_subtree(org, login):
+    own = login(org.top).get('/org_goals?limit=500').json
+    assert own['manager_id'] == org.top
+    owners = {goal['owner_id'] for goal in own['goals']}
+    assert {org.middle, org.employee} <= owners
+    assert org.outsider not in owners
+    assert max(goal['depth'] for goal in own['goals']) == 2
+
+    direct = login(org.top).get('/org_goals?limit=500&max_depth=1').json
+    assert {goal['depth'] for goal in direct['goals']} == {1}
+
+    assert login(org.employee).get('/org_goals').status_code == 403
+    assert login(org.admin).get('/org_goals').status_code == 400
+    assert login(org.admin).get(f'/org_goals?manager_id={org.top}&limit=500').json['goals'] == own['goals']
+
+
+def test_org_goals_pages_with_after(org, login):
+    client = login(org.top)
+    everything = client.get('/org_goals?limit=500').json['goals']
+    paged, after = [], None
+    while True:
+        page = client.get('/org_goals?limit=3' + (f'&after={after}' if after else '')).json
+        paged += page['goals']
+        after = page['next_after']
+        if after is None:
+            break
+    assert paged == everything
+
+
+@pytest.mark.parametrize('user, status', [('admin', 200), ('top', 403), ('employee', 403)])
+def test_organization_page_is_admin_only(org, login, user, status):
+    assert login(getattr(org, user)).get('/organization').status_code == status
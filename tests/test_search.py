@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.archive import archive_progress_updates
+from app.hierarchy import org_member_ids
+from app.models import User, Goal, ProgressUpdate, ProgressUpdateArchive
+from app.search import _index_available
+
+# Search only returns goals and comments the caller may see, whether it runs
+# on the FTS5 index or the LIKE fallback.
+
+
+@pytest.fixture(params=['fts5', 'like'])
+def engine(request, app):
+    with app.app_context():
+        bind = db.engine
+    _index_available.clear()
+    if request.param == 'like':
+        _index_available[bind] = False
+    yield request.param
+    _index_available.clear()
+
+
+def visible_owners(app, user_id):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        if user.role == 'Administrator':
+            return {owner_id for owner_id, in db.session.query(User.id)}
+        if user.role == 'Manager':
+            return set(db.session.scalars(org_member_ids(user.id, include_self=True)))
+        return {user.id}
+
+
+def owners_of(app, results):
+    with app.app_context():
+        goal_ids = {goal['id'] for goal in results['goals']} | {update['goal_id'] for update in results['updates']}
+        return {owner_id for owner_id, in db.session.query(Goal.user_id).filter(Goal.id.in_(goal_ids))}
+
+
+@pytest.mark.parametrize('user', ['admin', 'top', 'middle', 'employee'])
+def test_search_is_scoped_to_the_callers_organization(app, org, login, engine, user):
+    results = login(getattr(org, user)).get('/search?q=goal&limit=100').json
+    assert results['engine'] == engine
+    assert results['goals']
+    assert owners_of(app, results) <= visible_owners(app, getattr(org, user))
+
+
+def test_search_finds_archived_comments(app, org, login, engine):
+    with app.app_context():
+        audit = ProgressUpdate(goal_id=org.employee_goal, user_id=org.employee, update_value=1,
+                               comment='Quarterly audit submitted',
+                               timestamp=datetime.utcnow() - timedelta(days=400))
+        db.session.add(audit)
+        # The newest update is never archived
+        db.session.add(ProgressUpdate(goal_id=org.employee_goal, user_id=org.employee, update_value=2,
+                                      comment='Latest'))
+        db.session.commit()
+        audit_id = audit.id
+        archive_progress_updates(older_than_days=380)
+        assert db.session.get(ProgressUpdateArchive, audit_id) is not None
+
+    results = login(org.middle).get('/search?q=audit').json
+    assert [(update['id'], update['archived']) for update in results['updates']] == [(audit_id, True)]
+    assert login(org.other_top).get('/search?q=audit').json['updates'] == []